@@ -1,6 +1,27 @@
 from django.contrib import admin
+
+from core.admin import EstimatedCountMixin, KeysetPaginationMixin
+
 from .models import Student, Course, Enrollment
 
-admin.site.register(Student)
-admin.site.register(Course)
-admin.site.register(Enrollment)
+
+class StudentAdmin(EstimatedCountMixin, admin.ModelAdmin):
+    list_display = ["name"]
+    search_fields = ["^name"]
+
+
+class CourseAdmin(EstimatedCountMixin, admin.ModelAdmin):
+    list_display = ["name"]
+    search_fields = ["^name"]
+
+
+class EnrollmentAdmin(KeysetPaginationMixin, admin.ModelAdmin):
+    list_display = ["student", "course", "date_enrolled", "grade"]
+    list_select_related = ["student", "course"]
+    autocomplete_fields = ["student", "course"]
+    search_fields = ["^student__name", "^course__name"]
+
+
+admin.site.register(Student, StudentAdmin)
+admin.site.register(Course, CourseAdmin)
+admin.site.register(Enrollment, EnrollmentAdmin)
@@ -0,0 +1,172 @@
+"""
+Grade analytics computed in SQL.
+
+``Enrollment.grade`` is free-form text of up to two characters, so every
+spelling of a grade (any case, padded or not) is mapped to its points by a
+``Case``/``When`` expression; anything else, and a missing grade, counts as
+ungraded. Distributions, GPAs and percentiles are
+grouped aggregates and window functions over every course at once, so a
+report costs one query however many enrollments it covers. GPAs are
+unweighted since courses carry no credits.
+
+With the ``COURSE_GRADE_SUMMARIES`` setting on, every student's GPA is also
+kept in the ``GradeSummary`` table, refreshed for the student whose
+enrollment was saved or deleted. Queryset ``update()`` and ``bulk_create``
+bypass that; call ``refresh_summaries()`` for the students they touched.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Avg,
+    Case,
+    Count,
+    F,
+    FloatField,
+    Sum,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.functions import PercentRank, Trim, Upper
+
+from .models import Enrollment, GradeSummary, Student
+
+GRADE_POINTS = {
+    "A+": 4.0,
+    "A": 4.0,
+    "A-": 3.7,
+    "B+": 3.3,
+    "B": 3.0,
+    "B-": 2.7,
+    "C+": 2.3,
+    "C": 2.0,
+    "C-": 1.7,
+    "D+": 1.3,
+    "D": 1.0,
+    "D-": 0.7,
+    "F": 0.0,
+}
+DEANS_LIST_GPA = 3.5
+
+
+def spellings(grade) -> list:
+    """``"a"``, ``" A"`` and so on: what ``grade`` may be stored as."""
+    cases = {grade, grade.lower()}
+    if len(grade) == 1:
+        cases |= {pad for case in cases for pad in (f" {case}", f"{case} ")}
+    return sorted(cases)
+
+
+def grade_points(field="grade"):
+    """Points of the grade in ``field``, ``NULL`` when it isn't graded."""
+    return Case(
+        *[
+            When(**{f"{field}__in": spellings(grade), "then": Value(points)})
+            for grade, points in GRADE_POINTS.items()
+        ],
+        output_field=FloatField(),
+    )
+
+
+def graded(field="grade"):
+    return Count(grade_points(field))
+
+
+def grade_distribution(enrollments=None) -> dict:
+    """``{course_pk: {grade: count}}``, ungraded enrollments under ``None``."""
+    if enrollments is None:
+        enrollments = Enrollment.objects.all()
+    rows = (
+        enrollments.annotate(letter=Upper(Trim("grade")))
+        .order_by()
+        .values_list("course", "letter")
+        .annotate(count=Count("pk"))
+    )
+    distribution = {}
+    for course, letter, count in rows:
+        letter = letter if letter in GRADE_POINTS else None
+        by_grade = distribution.setdefault(course, {})
+        by_grade[letter] = by_grade.get(letter, 0) + count
+    return distribution
+
+
+def gpas(students=None):
+    """Students annotated with their ``gpa`` and ``graded_count``."""
+    if students is None:
+        students = Student.objects.all()
+    return students.annotate(
+        gpa=Avg(grade_points("enrollment__grade")),
+        graded_count=graded("enrollment__grade"),
+    )
+
+
+def deans_list(min_gpa=DEANS_LIST_GPA, min_graded=1):
+    """Students with at least ``min_gpa``, best first."""
+    return (
+        gpas()
+        .filter(gpa__gte=min_gpa, graded_count__gte=min_graded)
+        .order_by("-gpa", "name")
+    )
+
+
+def gpa_percentiles(students=None):
+    """Graded students with their ``percentile`` (0 to 1) by GPA."""
+    return (
+        gpas(students)
+        .filter(graded_count__gt=0)
+        .annotate(percentile=Window(PercentRank(), order_by=F("gpa").asc()))
+    )
+
+
+def course_percentiles(enrollments=None):
+    """
+    Graded enrollments with their ``points`` and their ``percentile``
+    (0 to 1) within their course.
+    """
+    if enrollments is None:
+        enrollments = Enrollment.objects.all()
+    return (
+        enrollments.annotate(points=grade_points())
+        .filter(points__isnull=False)
+        .annotate(
+            percentile=Window(
+                PercentRank(), partition_by=[F("course")], order_by=F("points").asc()
+            )
+        )
+    )
+
+
+def refresh_summaries(students=None) -> None:
+    """Recompute the ``GradeSummary`` rows of ``students`` (pks), or of all."""
+    enrollments = Enrollment.objects.all()
+    summaries = GradeSummary.objects.all()
+    if students is not None:
+        enrollments = enrollments.filter(student__in=students)
+        summaries = summaries.filter(student__in=students)
+    rows = (
+        enrollments.annotate(points=grade_points())
+        .filter(points__isnull=False)
+        .order_by()
+        .values_list("student")
+        .annotate(count=Count("points"), total=Sum("points"))
+    )
+    with transaction.atomic():
+        summaries.delete()
+        GradeSummary.objects.bulk_create(
+            GradeSummary(
+                student_id=student,
+                graded_count=count,
+                points_total=total,
+                gpa=total / count,
+            )
+            for student, count, total in rows
+        )
+
+
+def summaries_enabled() -> bool:
+    return getattr(settings, "COURSE_GRADE_SUMMARIES", False)
+
+
+def enrollment_changed(sender, instance, raw=False, **kwargs) -> None:
+    if summaries_enabled() and not raw:
+        refresh_summaries([instance.student_id])
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class CourseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.course'
+
+    def ready(self):
+        from .analytics import enrollment_changed
+
+        enrollment = self.get_model("Enrollment")
+        post_save.connect(enrollment_changed, sender=enrollment)
+        post_delete.connect(enrollment_changed, sender=enrollment)
@@ -1,15 +1,66 @@
-from django.db import models
+from django.db import connections, models, transaction
+
+
+def _pk(obj):
+    return obj.pk if isinstance(obj, models.Model) else obj
+
+
+class EnrollmentQuerySet(models.QuerySet):
+    def enroll(self, pairs, date) -> list:
+        """
+        Enroll ``(student, course)`` pairs, given as instances or pks, on
+        ``date`` and return the ``(student_id, course_id)`` pairs that were
+        new, in order.
+
+        Pairs are written in batches sized to the backend's parameter limit,
+        one transaction per batch: one SELECT finds the pairs that exist
+        already, and one ``INSERT`` with ``ignore_conflicts`` adds the rest,
+        so a pair enrolled concurrently is skipped instead of raising
+        ``IntegrityError``. Such a pair may be reported as new to both
+        callers, but only one row is written.
+        """
+        pairs = list(dict.fromkeys((_pk(s), _pk(c)) for s, c in pairs))
+        if not pairs:
+            return []
+        fields = [
+            field
+            for field in self.model._meta.concrete_fields
+            if not field.primary_key
+        ]
+        objs = [
+            self.model(student_id=student, course_id=course, date_enrolled=date)
+            for student, course in pairs
+        ]
+        batch_size = max(connections[self.db].ops.bulk_batch_size(fields, objs), 1)
+        new = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            with transaction.atomic(using=self.db):
+                existing = set(
+                    self.filter(
+                        student__in={student for student, _ in batch},
+                        course__in={course for _, course in batch},
+                    ).values_list("student", "course")
+                )
+                created = [
+                    obj
+                    for pair, obj in zip(batch, objs[start:start + batch_size])
+                    if pair not in existing
+                ]
+                self.bulk_create(created, ignore_conflicts=True)
+            new += [pair for pair in batch if pair not in existing]
+        return new
 
 
 class Student(models.Model):
-    name = models.CharField(max_length=20)
+    name = models.CharField(max_length=20, db_index=True)
 
     def __str__(self) -> str:
         return self.name
 
 
 class Course(models.Model):
-    name = models.CharField(max_length=20)
+    name = models.CharField(max_length=20, db_index=True)
     students = models.ManyToManyField(
         Student, related_name="courses", through="Enrollment"
     )
@@ -17,6 +68,17 @@ class Course(models.Model):
     def __str__(self) -> str:
         return self.name
 
+    def enroll_many(self, students, date) -> list:
+        """Enroll ``students`` on ``date`` and return the ones that were new."""
+        students = list(dict.fromkeys(students))
+        new = {
+            student
+            for student, _ in Enrollment.objects.enroll(
+                [(student, self) for student in students], date
+            )
+        }
+        return [student for student in students if _pk(student) in new]
+
 
 class Enrollment(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
@@ -24,6 +86,8 @@ class Enrollment(models.Model):
     date_enrolled = models.DateField()
     grade = models.CharField(max_length=2, blank=True, null=True)
 
+    objects = EnrollmentQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -33,3 +97,20 @@ class Enrollment(models.Model):
 
     def __str__(self) -> str:
         return f"{self.student} is enrolled in {self.course}"
+
+
+class GradeSummary(models.Model):
+    """A student's GPA, kept by ``analytics.refresh_summaries()``."""
+
+    student = models.OneToOneField(
+        Student,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="grade_summary",
+    )
+    graded_count = models.PositiveIntegerField(default=0)
+    points_total = models.FloatField(default=0)
+    gpa = models.FloatField(db_index=True)
+
+    def __str__(self) -> str:
+        return f"{self.student}: {self.gpa:.2f}"
@@ -1,3 +1,321 @@
+import datetime
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.paginator import EmptyPage
 from django.test import TestCase
+from django.urls import reverse
+
+from core.contenttypes import warm_content_types
+from core.pagination import (
+    EstimatedCountPaginator,
+    InvalidCursor,
+    KeysetPaginator,
+    estimate_count,
+)
+
+from .analytics import (
+    course_percentiles,
+    deans_list,
+    gpa_percentiles,
+    gpas,
+    grade_distribution,
+    grade_points,
+    refresh_summaries,
+    spellings,
+)
+from .models import Course, Enrollment, GradeSummary, Student
+
+OPENING = datetime.date(2021, 9, 1)
+
+
+class CourseTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Student.objects.bulk_create([Student(name=f"student {i}") for i in range(300)])
+        cls.students = list(Student.objects.order_by("pk"))
+        cls.courses = {
+            name: Course.objects.create(name=name)
+            for name in ("algebra", "biology", "chemistry")
+        }
+
+
+class EnrollTests(CourseTestCase):
+    def test_enroll_many(self):
+        algebra = self.courses["algebra"]
+        first, second, third = self.students[:3]
+        Enrollment.objects.create(student=second, course=algebra, date_enrolled=OPENING)
+        with self.assertNumQueries(4):
+            new = algebra.enroll_many([first, second, third, first], OPENING)
+        self.assertEqual(new, [first, third])
+        self.assertEqual(algebra.students.count(), 3)
+        self.assertEqual(algebra.enroll_many([third.pk], OPENING), [])
+
+    def test_enroll_across_courses_in_batches(self):
+        pairs = [
+            (student, course)
+            for student in self.students
+            for course in self.courses.values()
+        ]
+        Enrollment.objects.create(
+            student=self.students[0],
+            course=self.courses["biology"],
+            date_enrolled=OPENING,
+        )
+        # 900 pairs exceed one SQLite batch of 249 rows
+        with self.assertNumQueries(4 * 4):
+            new = Enrollment.objects.enroll(pairs, OPENING)
+        self.assertEqual(len(new), 899)
+        self.assertNotIn((self.students[0].pk, self.courses["biology"].pk), new)
+        self.assertEqual(Enrollment.objects.count(), 900)
+        self.assertEqual(Enrollment.objects.enroll(pairs[:10], OPENING), [])
+
+
+class AnalyticsTests(CourseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.ama, cls.kofi, cls.esi, cls.yaw = cls.students[:4]
+        grades = {
+            "algebra": [("A", cls.ama), ("b+", cls.kofi), (" C", cls.esi)],
+            "biology": [("A-", cls.ama), ("A", cls.kofi), ("I", cls.esi)],
+            "chemistry": [("B", cls.ama), (None, cls.kofi), ("F", cls.yaw)],
+        }
+        Enrollment.objects.bulk_create(
+            Enrollment(
+                student=student,
+                course=cls.courses[course],
+                date_enrolled=OPENING,
+                grade=grade,
+            )
+            for course, rows in grades.items()
+            for grade, student in rows
+        )
+
+    def test_grade_points(self):
+        self.assertEqual(spellings("A"), [" A", " a", "A", "A ", "a", "a "])
+        points = dict(
+            Enrollment.objects.filter(student=self.ama)
+            .annotate(points=grade_points())
+            .values_list("course__name", "points")
+        )
+        self.assertEqual(points, {"algebra": 4.0, "biology": 3.7, "chemistry": 3.0})
+
+    def test_grade_distribution(self):
+        with self.assertNumQueries(1):
+            distribution = grade_distribution()
+        self.assertEqual(
+            distribution,
+            {
+                self.courses["algebra"].pk: {"A": 1, "B+": 1, "C": 1},
+                self.courses["biology"].pk: {"A-": 1, "A": 1, None: 1},
+                self.courses["chemistry"].pk: {"B": 1, None: 1, "F": 1},
+            },
+        )
+
+    def test_gpas(self):
+        with self.assertNumQueries(1):
+            found = {
+                student.pk: (round(student.gpa, 2), student.graded_count)
+                for student in gpas().filter(graded_count__gt=0)
+            }
+        self.assertEqual(
+            found,
+            {
+                self.ama.pk: (3.57, 3),
+                self.kofi.pk: (3.65, 2),
+                self.esi.pk: (2.0, 1),
+                self.yaw.pk: (0.0, 1),
+            },
+        )
+        self.assertEqual(list(deans_list()), [self.kofi, self.ama])
+        self.assertEqual(list(deans_list(min_graded=3)), [self.ama])
+
+    def test_percentiles(self):
+        percentiles = {
+            student.pk: student.percentile for student in gpa_percentiles()
+        }
+        self.assertEqual(
+            percentiles,
+            {
+                self.yaw.pk: 0.0,
+                self.esi.pk: 1 / 3,
+                self.ama.pk: 2 / 3,
+                self.kofi.pk: 1.0,
+            },
+        )
+        algebra = {
+            enrollment.student_id: enrollment.percentile
+            for enrollment in course_percentiles().filter(
+                course=self.courses["algebra"]
+            )
+        }
+        self.assertEqual(
+            algebra, {self.esi.pk: 0.0, self.kofi.pk: 0.5, self.ama.pk: 1.0}
+        )
+
+    def test_summaries(self):
+        refresh_summaries()
+        self.assertEqual(GradeSummary.objects.count(), 4)
+        self.assertEqual(GradeSummary.objects.get(student=self.esi).gpa, 2.0)
+
+        enrollment = Enrollment.objects.get(student=self.esi, course__name="biology")
+        enrollment.grade = "A"
+        with self.settings(COURSE_GRADE_SUMMARIES=False):
+            enrollment.save()
+        self.assertEqual(GradeSummary.objects.get(student=self.esi).gpa, 2.0)
+        with self.settings(COURSE_GRADE_SUMMARIES=True):
+            enrollment.save()
+            self.assertEqual(GradeSummary.objects.get(student=self.esi).gpa, 3.0)
+            Enrollment.objects.filter(student=self.yaw).delete()
+        self.assertFalse(GradeSummary.objects.filter(student=self.yaw).exists())
+        self.assertEqual(GradeSummary.objects.count(), 3)
+
+
+class KeysetPaginationTests(CourseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.algebra = cls.courses["algebra"]
+        days = [OPENING + datetime.timedelta(days=i % 7) for i in range(120)]
+        Enrollment.objects.bulk_create(
+            Enrollment(student=student, course=cls.algebra, date_enrolled=day)
+            for student, day in zip(cls.students, days)
+        )
+
+    def walk(self, paginator):
+        pages, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            pages.append([enrollment.pk for enrollment in page])
+            if not page.has_next():
+                return pages, page
+            cursor = page.next_cursor
+
+    def test_pages_follow_the_ordering(self):
+        enrollments = Enrollment.objects.filter(course=self.algebra)
+        paginator = KeysetPaginator(enrollments, 25, ordering=["-date_enrolled"])
+        self.assertEqual(paginator.ordering, [("date_enrolled", True), ("pk", True)])
+        pages, last = self.walk(paginator)
+        expected = list(
+            enrollments.order_by("-date_enrolled", "-pk").values_list("pk", flat=True)
+        )
+        self.assertEqual([len(page) for page in pages], [25, 25, 25, 25, 20])
+        self.assertEqual(sum(pages, []), expected)
+
+        # and back again from the last page
+        page = paginator.page(last.previous_cursor)
+        self.assertEqual([enrollment.pk for enrollment in page], pages[-2])
+        self.assertTrue(page.has_next())
+        self.assertTrue(page.has_previous())
+
+    def test_nullable_ordering(self):
+        # every seventh enrollment is ungraded, spread over all pages
+        enrollments = Enrollment.objects.filter(course=self.algebra).order_by("pk")
+        for i, enrollment in enumerate(enrollments):
+            enrollment.grade = None if i % 7 == 0 else "ABCDF"[i % 5]
+        Enrollment.objects.bulk_update(enrollments, ["grade"])
+
+        graded = enrollments.exclude(grade=None)
+        ungraded = enrollments.filter(grade=None)
+        # NULLs sort as the largest grade
+        for ordering, expected in (
+            ("grade", [*graded.order_by("grade", "pk"), *ungraded]),
+            ("-grade", [*ungraded.reverse(), *graded.order_by("-grade", "-pk")]),
+        ):
+            with self.subTest(ordering=ordering):
+                paginator = KeysetPaginator(enrollments, 25, ordering=[ordering])
+                pages, last = self.walk(paginator)
+                self.assertEqual(sum(pages, []), [e.pk for e in expected])
+                page = paginator.page(last.previous_cursor)
+                self.assertEqual([enrollment.pk for enrollment in page], pages[-2])
+
+    def test_every_page_is_one_query(self):
+        paginator = KeysetPaginator(Enrollment.objects.order_by("pk"), 25)
+        page = paginator.page()
+        for _ in range(3):
+            with self.assertNumQueries(1):
+                page = paginator.page(page.next_cursor)
+        self.assertFalse(paginator.page().has_previous())
+
+    def test_invalid_cursors(self):
+        paginator = KeysetPaginator(Enrollment.objects.all(), 25, ordering=["pk"])
+        other = KeysetPaginator(Enrollment.objects.all(), 25, ordering=["student"])
+        cursor = other.page().next_cursor
+        for cursor in ["nonsense", cursor, paginator.page().next_cursor[:-3]]:
+            with self.assertRaises(InvalidCursor):
+                paginator.page(cursor)
+
+    def test_counts(self):
+        enrollments = Enrollment.objects.all()
+        self.assertEqual(KeysetPaginator(enrollments, 25).count, 120)
+        with self.assertNumQueries(1):
+            self.assertEqual(estimate_count(enrollments), 120)
+        Enrollment.objects.filter(pk__gt=100).delete()
+        # the estimate comes from the highest key, not the rows
+        self.assertEqual(
+            KeysetPaginator(enrollments, 25, estimate=True).count,
+            Enrollment.objects.order_by("pk").last().pk,
+        )
+        self.assertEqual(estimate_count(enrollments.filter(pk__lte=10)), 10)
+
+    def test_low_estimates_hide_no_rows(self):
+        students = Student.objects.order_by("pk")
+        for estimate in (180, 0):
+            with patch("core.pagination.estimate_count", return_value=estimate):
+                paginator = EstimatedCountPaginator(students, 100)
+                pages = [paginator.page(number) for number in (1, 2, 3)]
+            self.assertEqual([len(page) for page in pages], [100, 100, 100])
+            self.assertEqual(pages[2][99], self.students[-1])
+            self.assertTrue(pages[1].has_next())
+            self.assertFalse(pages[2].has_next())
+            self.assertEqual(paginator.count, 300)
+            with self.assertRaises(EmptyPage):
+                paginator.page(4)
+
+        warm_content_types()
+        admin = get_user_model().objects.create_superuser("admin", "", "admin")
+        self.client.force_login(admin)
+        url = reverse("admin:course_student_changelist")
+        with patch("core.pagination.estimate_count", return_value=0):
+            response = self.client.get(url, {"p": 3})
+        self.assertEqual(len(response.context["cl"].result_list), 100)
+        self.assertContains(response, "300 students")
+
+    def test_enrollment_list_view(self):
+        url = reverse("course:enrollment-list", args=[self.algebra.pk])
+        with self.assertNumQueries(2):
+            data = self.client.get(url).json()
+        self.assertEqual(len(data["results"]), 50)
+        self.assertEqual(data["results"][0]["name"], "student 0")
+        self.assertIsNone(data["previous"])
+        data = self.client.get(url, {"cursor": data["next"]}).json()
+        self.assertEqual(data["results"][0]["name"], "student 50")
+        self.assertEqual(self.client.get(url, {"cursor": "x"}).status_code, 400)
+
+    def test_enrollment_changelist(self):
+        warm_content_types()
+        admin = get_user_model().objects.create_superuser("admin", "", "admin")
+        self.client.force_login(admin)
+        url = reverse("admin:course_enrollment_changelist")
+        # session, user, estimated count and page, however many rows
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertContains(response, "about 120 enrollments")
+        self.assertEqual(len(response.context["cl"].result_list), 100)
+        with self.assertNumQueries(4):
+            response = self.client.get(url + response.context["cl"].next_url)
+        self.assertEqual(len(response.context["cl"].result_list), 20)
+        response = self.client.get(url, {"cursor": "x"})
+        self.assertRedirects(response, f"{url}?e=1", fetch_redirect_response=False)
+
+        # sorted by grade, descending: the ungraded rows straddle the pages
+        response = self.client.get(url, {"o": "-4"})
+        self.assertIsNone(response.context["cl"].result_list[99].grade)
+        response = self.client.get(url + response.context["cl"].next_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["cl"].result_list), 20)
 
-# Create your tests here.
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("admin:course_student_changelist"))
+        self.assertContains(response, "student 299")
@@ -0,0 +1,13 @@
+from django.urls import path
+
+from . import views
+
+app_name = "course"
+
+urlpatterns = [
+    path(
+        "courses/<int:course_pk>/enrollments/",
+        views.enrollment_list,
+        name="enrollment-list",
+    ),
+]
@@ -1,3 +1,31 @@
-from django.shortcuts import render
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
 
-# Create your views here.
+from core.pagination import InvalidCursor, KeysetPaginator, page_data
+
+from .models import Course
+
+PAGE_SIZE = 50
+
+
+@require_GET
+def enrollment_list(request, course_pk):
+    course = get_object_or_404(Course, pk=course_pk)
+    enrollments = course.enrollment_set.select_related("student")
+    paginator = KeysetPaginator(enrollments, PAGE_SIZE, ordering=["pk"])
+    try:
+        data = page_data(
+            paginator,
+            request.GET.get("cursor"),
+            lambda enrollment: {
+                "id": enrollment.pk,
+                "student": enrollment.student_id,
+                "name": enrollment.student.name,
+                "date_enrolled": enrollment.date_enrolled,
+                "grade": enrollment.grade,
+            },
+        )
+    except InvalidCursor:
+        return JsonResponse({"error": "invalid cursor"}, status=400)
+    return JsonResponse(data)
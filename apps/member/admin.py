@@ -1,9 +1,28 @@
 from django.contrib import admin
 
+from core.admin import EstimatedCountMixin, KeysetPaginationMixin
+
 from .models import Member, Group, Membership
 
-admin.site.register(Member)
-admin.site.register(Group)
-admin.site.register(Membership)
+
+class MemberAdmin(EstimatedCountMixin, admin.ModelAdmin):
+    list_display = ["name", "invite_subtree_size"]
+    search_fields = ["^name"]
+
+
+class GroupAdmin(EstimatedCountMixin, admin.ModelAdmin):
+    list_display = ["name", "member_count"]
+    readonly_fields = ["member_count"]
+    search_fields = ["^name"]
+
+
+class MembershipAdmin(KeysetPaginationMixin, admin.ModelAdmin):
+    list_display = ["member", "group", "inviter", "date_joined"]
+    list_select_related = ["member", "group", "inviter"]
+    autocomplete_fields = ["member", "group", "inviter"]
+    search_fields = ["^member__name", "^group__name"]
 
 
+admin.site.register(Member, MemberAdmin)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Membership, MembershipAdmin)
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 
 class MemberConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.member'
+
+    def ready(self):
+        from . import counts, mutual
+
+        membership = self.get_model("Membership")
+        post_save.connect(counts.membership_saved, sender=membership)
+        post_delete.connect(counts.membership_deleted, sender=membership)
+        m2m_changed.connect(counts.memberships_changed, sender=membership)
+        post_save.connect(mutual.membership_changed, sender=membership)
+        post_delete.connect(mutual.membership_changed, sender=membership)
+        m2m_changed.connect(mutual.memberships_changed, sender=membership)
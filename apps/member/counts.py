@@ -0,0 +1,47 @@
+"""
+Denormalized ``Group.member_count``.
+
+Single memberships move the count with an ``F()`` update from the
+``post_save`` and ``post_delete`` handlers, so concurrent joins never lose an
+increment. The handlers run after the write: inside ``transaction.atomic()``
+both commit together, but in autocommit they are separate transactions and a
+failure between them leaves the count off by one. Bulk paths that skip the
+per-row signals (``bulk_create``, ``Group.members.add()`` and friends)
+recount the groups they touched with
+``GroupQuerySet.refresh_member_counts()``, and
+``Group.objects.refresh_member_counts()`` repairs any drift.
+"""
+from django.db.models import F
+
+from .models import Group, Membership
+
+
+def membership_saved(sender, instance, created, raw=False, **kwargs) -> None:
+    if created and not raw:
+        Group.objects.filter(pk=instance.group_id).update(
+            member_count=F("member_count") + 1
+        )
+
+
+def membership_deleted(sender, instance, **kwargs) -> None:
+    Group.objects.filter(pk=instance.group_id, member_count__gt=0).update(
+        member_count=F("member_count") - 1
+    )
+
+
+def memberships_changed(sender, instance, action, reverse, pk_set, **kwargs) -> None:
+    if action == "pre_clear" and reverse:
+        # the member's groups are gone by post_clear
+        instance._cleared_group_pks = list(
+            Membership.objects.filter(member=instance).values_list("group", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        groups = [instance.pk]
+    elif action == "post_clear":
+        groups = instance.__dict__.pop("_cleared_group_pks", [])
+    else:
+        groups = pk_set
+    Group.objects.filter(pk__in=groups).refresh_member_counts()
@@ -0,0 +1,101 @@
+"""
+Bulk import of group memberships.
+
+Rows name the member, the group and the inviter, plus ``date_joined`` and
+``invite_reason``. They are read as a stream and handled a chunk at a time:
+members and groups are resolved by name with one query each, missing ones
+are created with ``bulk_create``, and memberships that already exist for a
+(member, group) pair are skipped. ``bulk_create`` sends no signals, so each
+chunk recounts ``Group.member_count`` for the groups it touched and drops the
+cached "groups in common" of the members it added. Memory use depends on the
+chunk size, not on the size of the file.
+"""
+import csv
+import datetime
+from itertools import islice
+
+from django.db import transaction
+
+from .models import Group, Member, Membership
+from .mutual import invalidate
+
+# a chunk names at most 2 * CHUNK_SIZE members, below SQLite's 999 variables
+CHUNK_SIZE = 400
+
+
+def read_rows(stream):
+    yield from csv.DictReader(stream)
+
+
+def _resolve(model, names) -> tuple:
+    """``({name: pk}, created)``, creating the names that don't exist yet."""
+    def lookup():
+        pks = {}
+        rows = model.objects.filter(name__in=names).order_by("pk")
+        for name, pk in rows.values_list("name", "pk"):
+            pks.setdefault(name, pk)
+        return pks
+
+    pks = lookup()
+    missing = [name for name in names if name not in pks]
+    if missing:
+        model.objects.bulk_create([model(name=name) for name in missing])
+        pks = lookup()
+    return pks, len(missing)
+
+
+def _import_chunk(rows, counts) -> None:
+    member_pks, created = _resolve(
+        Member, {row["member"] for row in rows} | {row["inviter"] for row in rows}
+    )
+    counts["members_created"] += created
+    group_pks, created = _resolve(Group, {row["group"] for row in rows})
+    counts["groups_created"] += created
+
+    seen = set(
+        Membership.objects.filter(
+            member__in={member_pks[row["member"]] for row in rows},
+            group__in=set(group_pks.values()),
+        ).values_list("member", "group")
+    )
+    memberships = []
+    for row in rows:
+        pair = (member_pks[row["member"]], group_pks[row["group"]])
+        if pair in seen:
+            counts["skipped"] += 1
+            continue
+        seen.add(pair)
+        memberships.append(
+            Membership(
+                member_id=pair[0],
+                group_id=pair[1],
+                inviter_id=member_pks[row["inviter"]],
+                date_joined=datetime.date.fromisoformat(str(row["date_joined"])),
+                invite_reason=row.get("invite_reason") or "",
+            )
+        )
+    if memberships:
+        Membership.objects.bulk_create(memberships)
+        Group.objects.filter(
+            pk__in={membership.group_id for membership in memberships}
+        ).refresh_member_counts()
+        invalidate({membership.member_id for membership in memberships})
+    counts["memberships_created"] += len(memberships)
+
+
+def import_memberships(rows, chunk_size=CHUNK_SIZE) -> dict:
+    """
+    Import membership rows, one transaction per chunk, and return the
+    ``members_created``, ``groups_created``, ``memberships_created`` and
+    ``skipped`` counts.
+    """
+    rows = iter(rows)
+    counts = dict.fromkeys(
+        ["members_created", "groups_created", "memberships_created", "skipped"], 0
+    )
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return counts
+        with transaction.atomic():
+            _import_chunk(chunk, counts)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from apps.member.importer import CHUNK_SIZE, import_memberships, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Import group memberships from a CSV file with member, group, "
+        "inviter, date_joined and invite_reason columns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        with open(options["path"], newline="", encoding="utf-8") as stream:
+            counts = import_memberships(
+                read_rows(stream), chunk_size=options["chunk_size"]
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Created {memberships_created} membership(s), "
+                "{members_created} member(s) and {groups_created} group(s); "
+                "skipped {skipped} existing membership(s).".format(**counts)
+            )
+        )
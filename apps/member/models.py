@@ -1,16 +1,146 @@
-from django.db import models
+from django.db import connection, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.translation import ugettext_lazy as _
 
 
+def _invite_edges(start_column, next_column) -> str:
+    """
+    ``edges(start_id, next_id)``: who invited whom, once per pair however
+    many groups the invite was for.
+    """
+    table = Membership._meta.db_table
+    return f"""
+        edges(start_id, next_id) AS (
+            SELECT DISTINCT {start_column}, {next_column} FROM {table}
+            WHERE {start_column} <> {next_column}
+        )
+    """
+
+
+def _invite_walk(start_column, next_column, depth=None) -> str:
+    """
+    Recursive CTE ``walk(member_id, depth)`` following the invite graph from
+    the ``start_column`` side of a membership to its ``next_column`` side,
+    starting at the member given as the first two query parameters.
+
+    ``UNION`` keeps one row per member and depth, so parallel invites don't
+    multiply the rows, and no walk goes deeper than the number of members
+    reachable at all, which ends it on invite cycles.
+    """
+    limit = "" if depth is None else f" AND w.depth < {int(depth)}"
+    return f"""
+        WITH RECURSIVE {_invite_edges(start_column, next_column)},
+        reach(member_id) AS (
+            SELECT next_id FROM edges WHERE start_id = %s
+            UNION
+            SELECT e.next_id FROM edges e JOIN reach r ON e.start_id = r.member_id
+        ),
+        walk(member_id, depth) AS (
+            SELECT next_id, 1 FROM edges WHERE start_id = %s
+            UNION
+            SELECT e.next_id, w.depth + 1
+            FROM edges e JOIN walk w ON e.start_id = w.member_id
+            WHERE w.depth < (SELECT COUNT(*) FROM reach){limit}
+        )
+    """
+
+
+class MemberQuerySet(models.QuerySet):
+    def refresh_invite_subtree_sizes(self) -> None:
+        """
+        Recount, in one statement, how many members everyone brought in
+        directly or transitively.
+        """
+        member_table = Member._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH RECURSIVE {_invite_edges("inviter_id", "member_id")},
+                reach(root, member_id) AS (
+                    SELECT start_id, next_id FROM edges
+                    UNION
+                    SELECT r.root, e.next_id
+                    FROM edges e JOIN reach r ON e.start_id = r.member_id
+                )
+                UPDATE {member_table} SET invite_subtree_size = (
+                    SELECT COUNT(*) FROM reach
+                    WHERE reach.root = {member_table}.id
+                    AND reach.member_id <> {member_table}.id
+                )
+                """
+            )
+
+    def invite_leaderboard(self):
+        """Members by ``invite_subtree_size``, as of the last refresh."""
+        return self.filter(invite_subtree_size__gt=0).order_by(
+            "-invite_subtree_size", "name"
+        )
+
+
 class Member(models.Model):
-    name = models.CharField(max_length=128)
+    name = models.CharField(max_length=128, db_index=True)
+    # cached by MemberQuerySet.refresh_invite_subtree_sizes()
+    invite_subtree_size = models.PositiveIntegerField(default=0, db_index=True)
+
+    objects = MemberQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    def _walk(self, start_column, next_column, depth=None):
+        member_table = Member._meta.db_table
+        return Member.objects.raw(
+            _invite_walk(start_column, next_column, depth)
+            + f"""
+            SELECT mm.*, MIN(walk.depth) AS depth
+            FROM {member_table} mm JOIN walk ON walk.member_id = mm.id
+            WHERE mm.id <> %s
+            GROUP BY mm.id
+            ORDER BY depth, mm.name
+            """,
+            [self.pk, self.pk, self.pk],
+        )
+
+    def invite_tree(self, depth=None):
+        """
+        Everyone this member brought in, directly or through the people they
+        invited, up to ``depth`` steps away, in one query. Each member carries
+        its shortest ``depth``.
+        """
+        return self._walk("inviter_id", "member_id", depth)
+
+    def invite_ancestors(self):
+        """
+        The inviters of this member, their inviters and so on, nearest
+        first, each with its ``depth``.
+        """
+        return self._walk("member_id", "inviter_id")
+
+    def groups_in_common(self, other) -> list:
+        """The groups both members belong to, by name. Cached per pair."""
+        from .mutual import groups_in_common
+
+        return groups_in_common([(self.pk, other.pk)])[self.pk, other.pk]
+
+
+class GroupQuerySet(models.QuerySet):
+    def refresh_member_counts(self) -> int:
+        """Recount ``member_count`` for these groups in one UPDATE."""
+        count = (
+            Membership.objects.filter(group=OuterRef("pk"))
+            .order_by()
+            .values("group")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return self.update(
+            member_count=Coalesce(Subquery(count), 0)
+        )
+
 
 class Group(models.Model):
-    name = models.CharField(_("name"), max_length=128)
+    name = models.CharField(_("name"), max_length=128, db_index=True)
     members = models.ManyToManyField(
         Member,
         through="Membership",
@@ -18,6 +148,10 @@ class Group(models.Model):
         through_fields=("group", "member"),
         verbose_name=_("group members"),
     )
+    # kept current by the Membership signal handlers in counts.py
+    member_count = models.PositiveIntegerField(_("member count"), default=0)
+
+    objects = GroupQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -45,5 +179,11 @@ class Membership(models.Model):
     date_joined = models.DateField()
     invite_reason = models.CharField(max_length=64)
 
+    class Meta:
+        indexes = [
+            # the second side of the "groups in common" self-join
+            models.Index(fields=["group", "member"], name="member_membership_pair"),
+        ]
+
     def __str__(self) -> str:
         return f"{self.member} is a member of {self.group}"
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Groups two members have in common, for any number of pairs at once.
+
+The pairs that aren't cached are answered by one self-join of
+``Membership`` per batch, matching each pair exactly: the first side walks
+the member's memberships, the second looks the other member up by the
+``(group, member)`` index. Results are cached per pair under both members'
+group versions; a membership change gives its member a new version once it
+commits, so pairs involving that member are looked up under new keys and
+stale entries simply expire.
+"""
+import uuid
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import F, Q
+
+from .models import Membership
+
+KEY_PREFIX = "member"
+TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(member_pk) -> str:
+    return f"{KEY_PREFIX}:{member_pk}:groups-version"
+
+
+def _versions(member_pks) -> dict:
+    keys = {_version_key(pk): pk for pk in member_pks}
+    versions = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    missing = {
+        key: uuid.uuid4().hex for key, pk in keys.items() if pk not in versions
+    }
+    if missing:
+        # another process may have set the same versions in the meantime
+        for key, version in missing.items():
+            cache.add(key, version, None)
+        versions.update(
+            {keys[key]: value for key, value in cache.get_many(missing).items()}
+        )
+    return versions
+
+
+def _pair_key(pair, versions) -> str:
+    first, second = pair
+    return (
+        f"{KEY_PREFIX}:common:{first}:{versions.get(first)}"
+        f":{second}:{versions.get(second)}"
+    )
+
+
+def _query(pairs) -> dict:
+    found = {pair: {} for pair in pairs}
+    # two parameters per pair
+    limit = connections[Membership.objects.db].features.max_query_params
+    size = limit // 2 if limit else len(pairs)
+    for start in range(0, len(pairs), size):
+        memberships = (
+            Membership.objects.filter(
+                reduce(
+                    or_,
+                    (
+                        Q(member=first, group__memberships__member=second)
+                        for first, second in pairs[start:start + size]
+                    ),
+                )
+            )
+            .annotate(other=F("group__memberships__member"))
+            .select_related("group")
+            .order_by("group__name", "group")
+        )
+        for membership in memberships:
+            pair = (membership.member_id, membership.other)
+            found[pair].setdefault(membership.group_id, membership.group)
+    return {pair: list(groups.values()) for pair, groups in found.items()}
+
+
+def groups_in_common(pairs) -> dict:
+    """
+    ``{(member_pk, other_pk): [Group, ...]}`` for each pair of member pks,
+    groups by name.
+    """
+    pairs = list(pairs)
+    ordered = {pair: tuple(sorted(pair)) for pair in pairs}
+    versions = _versions({pk for pair in pairs for pk in pair})
+    keys = {pair: _pair_key(pair, versions) for pair in set(ordered.values())}
+    cached = cache.get_many(keys.values())
+    found = {pair: cached[key] for pair, key in keys.items() if key in cached}
+    missing = [pair for pair in keys if pair not in found]
+    if missing:
+        fresh = _query(missing)
+        cache.set_many({keys[pair]: fresh[pair] for pair in missing}, TIMEOUT)
+        found.update(fresh)
+    return {pair: found[ordered[pair]] for pair in pairs}
+
+
+def invalidate(member_pks) -> None:
+    def bump():
+        cache.set_many(
+            {_version_key(pk): uuid.uuid4().hex for pk in member_pks}, None
+        )
+
+    transaction.on_commit(bump)
+
+
+def membership_changed(sender, instance, **kwargs) -> None:
+    invalidate([instance.member_id])
+
+
+def memberships_changed(sender, instance, action, reverse, pk_set, **kwargs) -> None:
+    if action == "pre_clear" and not reverse:
+        # the group's members are gone by post_clear
+        instance._cleared_member_pks = list(
+            instance.memberships.values_list("member", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        invalidate([instance.pk])
+    elif action == "post_clear":
+        invalidate(instance.__dict__.pop("_cleared_member_pks", []))
+    else:
+        invalidate(pk_set)
@@ -1,3 +1,284 @@
+import datetime
+import io
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.contenttypes import warm_content_types
+
+from .importer import import_memberships, read_rows
+from .models import Group, Member, Membership
+from .mutual import groups_in_common
+
+
+class MemberTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.members = {
+            name: Member.objects.create(name=name)
+            for name in ("ama", "kofi", "esi", "yaw", "akos")
+        }
+        cls.groups = {
+            name: Group.objects.create(name=name) for name in ("chess", "choir")
+        }
+
+    @classmethod
+    def join(cls, member, group, inviter, day=1):
+        return Membership.objects.create(
+            member=cls.members[member],
+            group=cls.groups[group],
+            inviter=cls.members[inviter],
+            date_joined=datetime.date(2021, 1, day),
+            invite_reason="friend",
+        )
+
+
+class ImportMembershipsTests(MemberTestCase):
+    feed = (
+        "member,group,inviter,date_joined,invite_reason\n"
+        "ama,chess,kofi,2021-05-01,club night\n"
+        "nana,chess,ama,2021-05-02,colleague\n"
+        "nana,chess,ama,2021-05-02,colleague\n"
+        "kwame,drama,nana,2021-05-03,\n"
+    )
+
+    def test_import(self):
+        self.join("ama", "chess", "kofi")
+        with self.assertNumQueries(11):
+            counts = import_memberships(read_rows(io.StringIO(self.feed)))
+        self.assertEqual(
+            counts,
+            {
+                "members_created": 2,
+                "groups_created": 1,
+                "memberships_created": 2,
+                "skipped": 2,
+            },
+        )
+        membership = Membership.objects.get(member__name="kwame")
+        self.assertEqual(
+            (membership.group.name, membership.inviter.name), ("drama", "nana")
+        )
+
+    def test_chunks_see_earlier_chunks(self):
+        counts = import_memberships(read_rows(io.StringIO(self.feed)), chunk_size=1)
+        self.assertEqual(counts["memberships_created"], 3)
+        self.assertEqual(counts["skipped"], 1)
+        self.assertEqual(Member.objects.filter(name="nana").count(), 1)
+
+
+class InviteGraphTests(MemberTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # ama -> kofi -> esi -> yaw, ama -> esi, and a cycle back to ama
+        cls.join("kofi", "chess", "ama")
+        cls.join("esi", "chess", "kofi")
+        cls.join("esi", "choir", "ama")
+        cls.join("yaw", "choir", "esi")
+        cls.join("ama", "choir", "yaw")
+
+    def walk(self, members):
+        return [(member.name, member.depth) for member in members]
+
+    def test_invite_tree(self):
+        ama = self.members["ama"]
+        with self.assertNumQueries(1):
+            tree = self.walk(ama.invite_tree())
+        self.assertEqual(tree, [("esi", 1), ("kofi", 1), ("yaw", 2)])
+        self.assertEqual(self.walk(ama.invite_tree(depth=1)), [("esi", 1), ("kofi", 1)])
+        self.assertEqual(self.walk(self.members["akos"].invite_tree()), [])
+
+    def test_invite_ancestors(self):
+        with self.assertNumQueries(1):
+            ancestors = self.walk(self.members["yaw"].invite_ancestors())
+        self.assertEqual(ancestors, [("esi", 1), ("ama", 2), ("kofi", 2)])
+
+    def test_leaderboard(self):
+        with self.assertNumQueries(1):
+            Member.objects.refresh_invite_subtree_sizes()
+        leaderboard = [
+            (member.name, member.invite_subtree_size)
+            for member in Member.objects.invite_leaderboard()
+        ]
+        self.assertEqual(
+            leaderboard, [("ama", 3), ("esi", 3), ("kofi", 3), ("yaw", 3)]
+        )
+
+    def test_parallel_invites_are_walked_once(self):
+        # a chain of nine members, each invite repeated in four groups, and
+        # an invite from the end of the chain back to its start
+        chain = [Member.objects.create(name=f"m{i}") for i in range(9)]
+        groups = [Group.objects.create(name=f"g{i}") for i in range(4)]
+        Membership.objects.bulk_create(
+            Membership(
+                member=member,
+                group=group,
+                inviter=inviter,
+                date_joined=datetime.date(2021, 1, 1),
+            )
+            for inviter, member in zip(chain, chain[1:] + chain[:1])
+            for group in groups
+        )
+        tree = self.walk(chain[0].invite_tree())
+        self.assertEqual(tree, [(f"m{i}", i) for i in range(1, 9)])
+        self.assertEqual(self.walk(chain[0].invite_tree(depth=2)), tree[:2])
+        ancestors = self.walk(chain[3].invite_ancestors())
+        self.assertEqual(ancestors[:2], [("m2", 1), ("m1", 2)])
+        Member.objects.refresh_invite_subtree_sizes()
+        sizes = Member.objects.filter(pk__in=[member.pk for member in chain])
+        self.assertEqual(
+            set(sizes.values_list("invite_subtree_size", flat=True)), {8}
+        )
+
+
+class MemberCountTests(MemberTestCase):
+    def count(self, group):
+        return Group.objects.get(name=group).member_count
+
+    def test_join_and_leave(self):
+        membership = self.join("ama", "chess", "kofi")
+        self.join("kofi", "chess", "ama")
+        self.assertEqual(self.count("chess"), 2)
+        membership.delete()
+        self.assertEqual(self.count("chess"), 1)
+        self.members["kofi"].delete()
+        self.assertEqual(self.count("chess"), 0)
+
+    def test_m2m_writes(self):
+        chess = self.groups["chess"]
+        defaults = {
+            "inviter": self.members["ama"],
+            "date_joined": datetime.date(2021, 1, 1),
+        }
+        chess.members.add(
+            self.members["kofi"], self.members["esi"], through_defaults=defaults
+        )
+        self.assertEqual(self.count("chess"), 2)
+        self.members["kofi"].groups.clear()
+        self.assertEqual(self.count("chess"), 1)
+        chess.members.clear()
+        self.assertEqual(self.count("chess"), 0)
+
+    def test_import_and_refresh(self):
+        self.join("ama", "chess", "kofi")
+        import_memberships(read_rows(io.StringIO(ImportMembershipsTests.feed)))
+        self.assertEqual(self.count("chess"), 2)
+        self.assertEqual(self.count("drama"), 1)
+        Group.objects.update(member_count=0)
+        Group.objects.refresh_member_counts()
+        self.assertEqual(
+            dict(Group.objects.values_list("name", "member_count")),
+            {"chess": 2, "choir": 0, "drama": 1},
+        )
+
+
+class GroupsInCommonTests(MemberTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.groups["drama"] = Group.objects.create(name="drama")
+        for group in ("chess", "choir", "drama"):
+            cls.join("ama", group, "ama")
+        cls.join("kofi", "chess", "ama")
+        cls.join("kofi", "drama", "ama")
+        cls.join("esi", "choir", "ama")
+
+    def setUp(self):
+        cache.clear()
+
+    def names(self, groups):
+        return [group.name for group in groups]
+
+    def test_groups_in_common(self):
+        ama, kofi = self.members["ama"], self.members["kofi"]
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names(ama.groups_in_common(kofi)), ["chess", "drama"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(kofi.groups_in_common(ama)), ["chess", "drama"])
+        self.assertEqual(self.names(kofi.groups_in_common(self.members["esi"])), [])
+
+    def test_bulk_pairs(self):
+        pk = {name: member.pk for name, member in self.members.items()}
+        pairs = [
+            (pk["ama"], pk["kofi"]),
+            (pk["esi"], pk["ama"]),
+            (pk["kofi"], pk["esi"]),
+            (pk["ama"], pk["akos"]),
+        ]
+        with self.assertNumQueries(1):
+            common = groups_in_common(pairs)
+        self.assertEqual(
+            [self.names(common[pair]) for pair in pairs],
+            [["chess", "drama"], ["choir"], [], []],
+        )
+
+    def test_only_requested_pairs_are_joined(self):
+        for name in ("esi", "yaw", "akos"):
+            self.join(name, "chess", "ama")
+        pk = {name: member.pk for name, member in self.members.items()}
+        pairs = [
+            (pk["ama"], pk["kofi"]),
+            (pk["esi"], pk["yaw"]),
+            (pk["akos"], pk["ama"]),
+        ]
+        with patch.object(connection.features, "max_query_params", 4):
+            with CaptureQueriesContext(connection) as queries:
+                common = groups_in_common(pairs)
+        # two pairs per batch
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(
+            [self.names(common[pair]) for pair in pairs],
+            [["chess", "drama"], ["chess"], ["chess"]],
+        )
+        # one row per requested pair and group, none for other co-members
+        with connection.cursor() as cursor:
+            rows = 0
+            for query in queries:
+                cursor.execute(query["sql"])
+                rows += len(cursor.fetchall())
+        self.assertEqual(rows, 4)
+
+    def test_membership_changes_refresh_pairs(self):
+        ama, esi = self.members["ama"], self.members["esi"]
+        self.assertEqual(self.names(ama.groups_in_common(esi)), ["choir"])
+        with self.captureOnCommitCallbacks(execute=True):
+            membership = self.join("esi", "chess", "ama")
+        self.assertEqual(self.names(ama.groups_in_common(esi)), ["chess", "choir"])
+        with self.captureOnCommitCallbacks(execute=True):
+            membership.delete()
+        self.assertEqual(self.names(ama.groups_in_common(esi)), ["choir"])
+
+
+class MembershipListTests(MemberTestCase):
+    def test_pages(self):
+        for name in ("kofi", "ama", "esi"):
+            self.join(name, "chess", "yaw")
+        url = reverse("member:membership-list", args=[self.groups["chess"].pk])
+        with patch("apps.member.views.PAGE_SIZE", 2), self.assertNumQueries(2):
+            data = self.client.get(url).json()
+        self.assertEqual([m["name"] for m in data["results"]], ["kofi", "ama"])
+        with patch("apps.member.views.PAGE_SIZE", 2):
+            data = self.client.get(url, {"cursor": data["next"]}).json()
+        self.assertEqual([m["name"] for m in data["results"]], ["esi"])
+        self.assertIsNone(data["next"])
 
-# Create your tests here.
+    def test_changelists(self):
+        warm_content_types()
+        for name in self.members:
+            self.join(name, "chess", "yaw")
+        admin = get_user_model().objects.create_superuser("admin", "", "admin")
+        self.client.force_login(admin)
+        # session, user, estimated count and page
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("admin:member_membership_changelist"))
+        self.assertContains(response, "about 5 memberships")
+        # a single page is counted exactly, without the estimate
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("admin:member_group_changelist"))
+        self.assertContains(response, "<td class=\"field-member_count\">5</td>")
@@ -0,0 +1,13 @@
+from django.urls import path
+
+from . import views
+
+app_name = "member"
+
+urlpatterns = [
+    path(
+        "groups/<int:group_pk>/memberships/",
+        views.membership_list,
+        name="membership-list",
+    ),
+]
@@ -1,3 +1,31 @@
-from django.shortcuts import render
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
 
-# Create your views here.
+from core.pagination import InvalidCursor, KeysetPaginator, page_data
+
+from .models import Group
+
+PAGE_SIZE = 50
+
+
+@require_GET
+def membership_list(request, group_pk):
+    group = get_object_or_404(Group, pk=group_pk)
+    memberships = group.memberships.select_related("member")
+    paginator = KeysetPaginator(memberships, PAGE_SIZE, ordering=["pk"])
+    try:
+        data = page_data(
+            paginator,
+            request.GET.get("cursor"),
+            lambda membership: {
+                "id": membership.pk,
+                "member": membership.member_id,
+                "name": membership.member.name,
+                "inviter": membership.inviter_id,
+                "date_joined": membership.date_joined,
+            },
+        )
+    except InvalidCursor:
+        return JsonResponse({"error": "invalid cursor"}, status=400)
+    return JsonResponse(data)
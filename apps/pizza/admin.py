@@ -1,6 +1,28 @@
 from django.contrib import admin
+
+from core.admin import EstimatedCountMixin
+
 from .models import Pizza, Topping, ToppingAmount
 
-admin.site.register(Pizza)
-admin.site.register(Topping)
-admin.site.register(ToppingAmount)
+
+class PizzaAdmin(EstimatedCountMixin, admin.ModelAdmin):
+    list_display = ["name"]
+    search_fields = ["^name"]
+
+
+class ToppingAdmin(EstimatedCountMixin, admin.ModelAdmin):
+    list_display = ["name"]
+    search_fields = ["^name"]
+
+
+class ToppingAmountAdmin(EstimatedCountMixin, admin.ModelAdmin):
+    list_display = ["pizza", "topping", "amount"]
+    list_select_related = ["pizza", "topping"]
+    autocomplete_fields = ["pizza", "topping"]
+    list_filter = ["amount"]
+    search_fields = ["^pizza__name", "^topping__name"]
+
+
+admin.site.register(Pizza, PizzaAdmin)
+admin.site.register(Topping, ToppingAdmin)
+admin.site.register(ToppingAmount, ToppingAmountAdmin)
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 
 class PizzaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.pizza'
+
+    def ready(self):
+        from .menu import invalidate_menu
+
+        for name in ("Pizza", "Topping", "ToppingAmount"):
+            model = self.get_model(name)
+            post_save.connect(invalidate_menu, sender=model)
+            post_delete.connect(invalidate_menu, sender=model)
+        # Pizza.toppings.add()/set() write ToppingAmount rows in bulk
+        m2m_changed.connect(invalidate_menu, sender=self.get_model("ToppingAmount"))
@@ -0,0 +1,54 @@
+"""
+Topping demand forecasting.
+
+Given how many of each pizza are expected, total topping use is
+``sum(count * amount)`` over the recipes. The counts are folded into the
+query as a ``Case`` expression, so the database does the multiplication and
+grouping and the cost depends on the size of the menu, not the number of
+orders.
+"""
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from .models import ToppingAmount
+
+BATCH_SIZE = 400
+
+
+def batch_size(using) -> int:
+    # each pizza costs three parameters: its WHEN pk, its THEN count and its
+    # entry in ``pizza__in``
+    limit = connections[using].features.max_query_params
+    return min(BATCH_SIZE, limit // 3) if limit else BATCH_SIZE
+
+
+def topping_demand(pizza_counts) -> dict:
+    """
+    Units of every topping needed for ``pizza_counts``, a mapping of pizza
+    (or pizza pk) to the number of pizzas, as ``{topping_pk: units}``. A
+    double portion counts as two units.
+    """
+    counts = [
+        (getattr(pizza, "pk", pizza), count)
+        for pizza, count in pizza_counts.items()
+        if count
+    ]
+    demand = {}
+    size = batch_size(ToppingAmount.objects.db)
+    for start in range(0, len(counts), size):
+        batch = counts[start:start + size]
+        multiplier = Case(
+            *(When(pizza_id=pk, then=Value(count)) for pk, count in batch),
+            output_field=IntegerField(),
+        )
+        rows = (
+            ToppingAmount.objects.filter(
+                pizza__in=[pk for pk, _ in batch], topping__isnull=False
+            )
+            .values("topping")
+            .annotate(units=Sum(F("amount") * multiplier))
+            .values_list("topping", "units")
+        )
+        for topping, units in rows:
+            demand[topping] = demand.get(topping, 0) + units
+    return demand
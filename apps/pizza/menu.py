@@ -0,0 +1,76 @@
+"""
+The pizza menu, built in a constant number of queries and cached.
+
+Toppings are loaded through ``ToppingAmount`` with their ``Topping`` joined
+in, so rendering a topping line never goes back to the database. The
+serialized menu is cached under a menu version. A change to a ``Pizza``,
+``Topping`` or ``ToppingAmount`` replaces the version once it commits, and
+readers take the version before they query. A reader that built the old
+menu before the commit therefore stores it under the old version, which is
+never read again and expires with ``MENU_TIMEOUT``.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from .models import Pizza, ToppingAmount
+
+MENU_CACHE_KEY = "pizza:menu"
+MENU_VERSION_KEY = "pizza:menu-version"
+MENU_TIMEOUT = 60 * 60 * 24
+
+
+def menu_queryset():
+    return Pizza.objects.order_by("name").prefetch_related(
+        Prefetch(
+            "topping_amounts",
+            queryset=ToppingAmount.objects.filter(topping__isnull=False)
+            .select_related("topping")
+            .order_by("topping__name"),
+        )
+    )
+
+
+def build_menu() -> list:
+    return [
+        {
+            "id": pizza.pk,
+            "name": pizza.name,
+            "toppings": [
+                {
+                    "id": topping_amount.topping_id,
+                    "name": topping_amount.topping.name,
+                    "amount": topping_amount.amount,
+                    "label": str(topping_amount),
+                }
+                for topping_amount in pizza.topping_amounts.all()
+            ],
+        }
+        for pizza in menu_queryset()
+    ]
+
+
+def menu_version() -> str:
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        # another process may set it first; use whichever won
+        cache.add(MENU_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(MENU_VERSION_KEY)
+    return version
+
+
+def get_menu() -> list:
+    key = f"{MENU_CACHE_KEY}:{menu_version()}"
+    menu = cache.get(key)
+    if menu is None:
+        menu = build_menu()
+        cache.set(key, menu, MENU_TIMEOUT)
+    return menu
+
+
+def invalidate_menu(**kwargs) -> None:
+    transaction.on_commit(
+        lambda: cache.set(MENU_VERSION_KEY, uuid.uuid4().hex, None)
+    )
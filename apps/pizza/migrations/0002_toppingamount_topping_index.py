@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pizza', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='toppingamount',
+            index=models.Index(fields=['topping', 'pizza'], name='pizza_toppingamount_topping'),
+        ),
+    ]
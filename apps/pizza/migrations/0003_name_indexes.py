@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pizza', '0002_toppingamount_topping_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pizza',
+            name='name',
+            field=models.CharField(db_index=True, max_length=50, verbose_name='name of pizza'),
+        ),
+        migrations.AlterField(
+            model_name='topping',
+            name='name',
+            field=models.CharField(db_index=True, max_length=50, verbose_name='name of toppings'),
+        ),
+    ]
@@ -1,9 +1,101 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 
 
+def _pks(objs) -> set:
+    return {getattr(obj, "pk", obj) for obj in objs}
+
+
+class PizzaQuerySet(models.QuerySet):
+    def with_toppings(self, all=(), any=(), none=()) -> "PizzaQuerySet":
+        """
+        Pizzas with every topping in ``all``, at least one in ``any`` and
+        none in ``none`` (Topping instances or pks).
+
+        Each condition is one subquery on ``ToppingAmount``; ``all`` is a
+        relational division (GROUP BY pizza HAVING COUNT = len(all)), so the
+        cost doesn't grow with the number of toppings asked for.
+        """
+        queryset = self
+        amounts = ToppingAmount.objects.filter(pizza__isnull=False)
+        required = _pks(all)
+        if required:
+            queryset = queryset.filter(
+                pk__in=amounts.filter(topping__in=required)
+                .values("pizza")
+                .annotate(matched=models.Count("topping", distinct=True))
+                .filter(matched=len(required))
+                .values("pizza")
+            )
+        if any:
+            queryset = queryset.filter(
+                pk__in=amounts.filter(topping__in=_pks(any)).values("pizza")
+            )
+        if none:
+            queryset = queryset.exclude(
+                pk__in=amounts.filter(topping__in=_pks(none)).values("pizza")
+            )
+        return queryset
+
+    def set_recipes(self, recipes) -> dict:
+        """
+        Make the toppings of several pizzas match ``recipes``, a mapping of
+        pizza to ``{topping: amount}`` (instances or pks).
+
+        The current rows are diffed against the recipes, and the changes are
+        applied with at most one bulk insert, one bulk update and one delete.
+        Unchanged rows are left alone. Returns the ``created``, ``updated``
+        and ``deleted`` counts.
+        """
+        recipes = {
+            getattr(pizza, "pk", pizza): {
+                getattr(topping, "pk", topping): amount
+                for topping, amount in recipe.items()
+            }
+            for pizza, recipe in recipes.items()
+        }
+        created, updated, deleted = [], [], []
+        with transaction.atomic():
+            kept = set()
+            for row in ToppingAmount.objects.filter(pizza__in=recipes).order_by("pk"):
+                key = (row.pizza_id, row.topping_id)
+                amount = recipes[row.pizza_id].get(row.topping_id)
+                if amount is None or key in kept:
+                    deleted.append(row.pk)
+                    continue
+                kept.add(key)
+                if row.amount != amount:
+                    row.amount = amount
+                    updated.append(row)
+            for pizza, recipe in recipes.items():
+                for topping, amount in recipe.items():
+                    if (pizza, topping) not in kept:
+                        created.append(
+                            ToppingAmount(
+                                pizza_id=pizza, topping_id=topping, amount=amount
+                            )
+                        )
+
+            if created:
+                ToppingAmount.objects.bulk_create(created)
+            if updated:
+                ToppingAmount.objects.bulk_update(updated, ["amount"])
+            if deleted:
+                ToppingAmount.objects.filter(pk__in=deleted).delete()
+            if created or updated:
+                # bulk writes send no signals
+                from .menu import invalidate_menu
+
+                invalidate_menu()
+        return {
+            "created": len(created),
+            "updated": len(updated),
+            "deleted": len(deleted),
+        }
+
+
 class Pizza(models.Model):
-    name = models.CharField(_("name of pizza"), max_length=50)
+    name = models.CharField(_("name of pizza"), max_length=50, db_index=True)
     toppings = models.ManyToManyField(
         "Topping",
         verbose_name=_("toppings"),
@@ -11,12 +103,18 @@ class Pizza(models.Model):
         through="ToppingAmount",
     )
 
+    objects = PizzaQuerySet.as_manager()
+
     def __str__(self) -> str:
         return self.name
 
+    def set_toppings(self, recipe) -> dict:
+        """Make this pizza's toppings match ``{topping: amount}``."""
+        return Pizza.objects.set_recipes({self: recipe})
+
 
 class Topping(models.Model):
-    name = models.CharField(_("name of toppings"), max_length=50)
+    name = models.CharField(_("name of toppings"), max_length=50, db_index=True)
 
     def __str__(self) -> str:
         return self.name
@@ -50,5 +148,12 @@ class ToppingAmount(models.Model):
         default=AmountChoices.REGULAR,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["topping", "pizza"], name="pizza_toppingamount_topping"
+            )
+        ]
+
     def __str__(self) -> str:
         return f"{self.amount} of {self.topping}"
\ No newline at end of file
@@ -1,3 +1,237 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from core.contenttypes import warm_content_types
+
+from .demand import batch_size, topping_demand
+from .menu import (
+    MENU_CACHE_KEY,
+    MENU_TIMEOUT,
+    build_menu,
+    get_menu,
+    menu_version,
+)
+from .models import Pizza, Topping, ToppingAmount
+
+
+class PizzaTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.toppings = {
+            name: Topping.objects.create(name=name)
+            for name in ("anchovies", "cheese", "mushrooms", "olives", "tomato")
+        }
+        cls.pizzas = {}
+        for name, recipe in (
+            ("Margherita", {"cheese": 2, "tomato": 1}),
+            ("Funghi", {"cheese": 1, "mushrooms": 2, "tomato": 1}),
+            ("Napoli", {"anchovies": 1, "cheese": 1, "olives": 1, "tomato": 1}),
+            ("Boscaiola", {"mushrooms": 3, "olives": 1}),
+        ):
+            pizza = cls.pizzas[name] = Pizza.objects.create(name=name)
+            for topping, amount in recipe.items():
+                ToppingAmount.objects.create(
+                    pizza=pizza, topping=cls.toppings[topping], amount=amount
+                )
+
+
+class MenuTests(PizzaTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_menu_queries_do_not_grow_with_toppings(self):
+        with self.assertNumQueries(2):
+            menu = get_menu()
+        self.assertEqual(
+            [pizza["name"] for pizza in menu],
+            ["Boscaiola", "Funghi", "Margherita", "Napoli"],
+        )
+        self.assertEqual(menu[0]["toppings"][0]["label"], "3 of mushrooms")
+        with self.assertNumQueries(0):
+            self.assertEqual(get_menu(), menu)
+
+    def test_changes_invalidate_menu(self):
+        get_menu()
+        with self.captureOnCommitCallbacks(execute=True):
+            Topping.objects.filter(name="olives").get().delete()
+        self.assertEqual(len(get_menu()[0]["toppings"]), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pizzas["Margherita"].toppings.add(
+                self.toppings["mushrooms"], through_defaults={"amount": 1}
+            )
+        self.assertEqual(len(get_menu()[2]["toppings"]), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Pizza.objects.create(name="Bianca")
+        self.assertEqual(get_menu()[0]["name"], "Bianca")
+
+    def test_reader_racing_a_write_cannot_cache_the_old_menu(self):
+        # a reader misses the cache and builds the menu before the write
+        # commits, then stores it after the commit has invalidated the menu
+        stale_key = f"{MENU_CACHE_KEY}:{menu_version()}"
+        stale_menu = build_menu()
+        with self.captureOnCommitCallbacks(execute=True):
+            Pizza.objects.create(name="Bianca")
+        cache.set(stale_key, stale_menu, MENU_TIMEOUT)
+        self.assertEqual(get_menu()[0]["name"], "Bianca")
+
+
+class ToppingDemandTests(PizzaTestCase):
+    def test_demand_in_one_query(self):
+        orders = {
+            self.pizzas["Margherita"]: 10,
+            self.pizzas["Funghi"].pk: 4,
+            self.pizzas["Boscaiola"]: 2,
+            self.pizzas["Napoli"]: 0,
+        }
+        with self.assertNumQueries(1):
+            demand = topping_demand(orders)
+        names = {
+            topping.name: demand.get(topping.pk) for topping in self.toppings.values()
+        }
+        self.assertEqual(
+            names,
+            {
+                "anchovies": None,
+                "cheese": 24,
+                "mushrooms": 14,
+                "olives": 2,
+                "tomato": 14,
+            },
+        )
+
+    def test_no_orders(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(topping_demand({}), {})
+
+    def test_batches_fit_sqlite_parameter_limit(self):
+        # SQLite is declared to take 999 parameters, three per pizza
+        self.assertEqual(batch_size("default"), 333)
+        orders = dict.fromkeys(range(10_000, 10_450), 1)
+        orders[self.pizzas["Margherita"].pk] = 2
+        with self.assertNumQueries(2):
+            demand = topping_demand(orders)
+        self.assertEqual(demand[self.toppings["cheese"].pk], 4)
+
+
+class WithToppingsTests(PizzaTestCase):
+    def names(self, queryset):
+        return sorted(pizza.name for pizza in queryset)
+
+    def test_all_any_none(self):
+        t = self.toppings
+        pizzas = Pizza.objects.with_toppings
+        self.assertEqual(
+            self.names(pizzas(all=[t["cheese"], t["tomato"]])),
+            ["Funghi", "Margherita", "Napoli"],
+        )
+        self.assertEqual(
+            self.names(pizzas(all=[t["mushrooms"], t["olives"]])), ["Boscaiola"]
+        )
+        self.assertEqual(
+            self.names(pizzas(any=[t["olives"], t["anchovies"]])),
+            ["Boscaiola", "Napoli"],
+        )
+        self.assertEqual(
+            self.names(
+                pizzas(all=[t["cheese"]], none=[t["anchovies"].pk, t["mushrooms"]])
+            ),
+            ["Margherita"],
+        )
+        self.assertEqual(self.names(pizzas(all=list(t.values()))), [])
+
+    def test_none_ignores_orphaned_amounts(self):
+        ToppingAmount.objects.create(pizza=None, topping=self.toppings["olives"])
+        self.assertEqual(
+            Pizza.objects.with_toppings(none=[self.toppings["olives"]]).count(), 2
+        )
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            list(
+                Pizza.objects.with_toppings(
+                    all=self.toppings.values(),
+                    any=self.toppings.values(),
+                    none=self.toppings.values(),
+                )
+            )
+
+
+class SetToppingsTests(PizzaTestCase):
+    def recipe(self, pizza):
+        return {
+            amount.topping.name: amount.amount
+            for amount in pizza.topping_amounts.select_related("topping")
+        }
+
+    def test_diff_against_current_rows(self):
+        pizza = self.pizzas["Funghi"]
+        t = self.toppings
+        unchanged = pizza.topping_amounts.get(topping=t["tomato"])
+        recipe = {t["tomato"]: 1, t["mushrooms"]: 3, t["olives"]: 1}
+        with self.assertNumQueries(7):
+            counts = pizza.set_toppings(recipe)
+        self.assertEqual(counts, {"created": 1, "updated": 1, "deleted": 1})
+        self.assertEqual(
+            self.recipe(pizza), {"tomato": 1, "mushrooms": 3, "olives": 1}
+        )
+        self.assertEqual(
+            pizza.topping_amounts.get(topping=t["tomato"]).pk, unchanged.pk
+        )
+
+        counts = pizza.set_toppings(recipe)
+        self.assertEqual(counts, {"created": 0, "updated": 0, "deleted": 0})
+
+    def test_many_pizzas(self):
+        t = self.toppings
+        counts = Pizza.objects.set_recipes(
+            {
+                self.pizzas["Margherita"]: {t["cheese"].pk: 3, t["tomato"].pk: 1},
+                self.pizzas["Napoli"].pk: {},
+            }
+        )
+        self.assertEqual(counts, {"created": 0, "updated": 1, "deleted": 4})
+        self.assertEqual(self.recipe(self.pizzas["Napoli"]), {})
+
+    def test_menu_refreshes(self):
+        cache.clear()
+        get_menu()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pizzas["Margherita"].set_toppings({self.toppings["cheese"]: 1})
+        toppings = get_menu()[2]["toppings"]
+        self.assertEqual([topping["label"] for topping in toppings], ["1 of cheese"])
+
+
+class AdminTests(PizzaTestCase):
+    def setUp(self):
+        # otherwise the first request of a test also loads the content types
+        warm_content_types()
+        admin = get_user_model().objects.create_superuser("admin", "", "admin")
+        self.client.force_login(admin)
+
+    def test_changelist_query_budget(self):
+        # session, user and page; one page is counted exactly, without the
+        # estimate
+        url = reverse("admin:pizza_toppingamount_changelist")
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, "Boscaiola")
+        for pizza in self.pizzas.values():
+            pizza.set_toppings({topping: 1 for topping in self.toppings.values()})
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+    def test_search(self):
+        url = reverse("admin:pizza_toppingamount_changelist")
+        response = self.client.get(url, {"q": "napo"})
+        self.assertEqual(len(response.context["cl"].result_list), 4)
+
+    def test_change_form_uses_autocomplete(self):
+        url = reverse("admin:pizza_toppingamount_add")
+        # session, user, and the savepoint around the form
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertContains(response, "admin-autocomplete")
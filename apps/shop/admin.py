@@ -1,3 +1,20 @@
 from django.contrib import admin
 
-# Register your models here.
+from core.admin import KeysetPaginationMixin
+
+from .models import CartItem
+
+
+class CartItemAdmin(KeysetPaginationMixin, admin.ModelAdmin):
+    list_display = [
+        "cart",
+        "product_content_type",
+        "product_object_id",
+        "quantity",
+        "unit_price",
+    ]
+    list_select_related = ["cart", "product_content_type"]
+    raw_id_fields = ["cart"]
+
+
+admin.site.register(CartItem, CartItemAdmin)
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
 class ShopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.shop'
+
+    def ready(self):
+        from .cart_cache import bump_version
+        from .search import install_after_migrate
+
+        CartItem = self.get_model("CartItem")
+        post_migrate.connect(install_after_migrate, sender=self)
+        post_save.connect(bump_version, sender=CartItem)
+        post_delete.connect(bump_version, sender=CartItem)
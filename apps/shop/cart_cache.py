@@ -0,0 +1,117 @@
+"""
+Read-through cache of serialized carts.
+
+Entries are keyed by cart and ``Cart.version``. Every write to a cart's items
+bumps the version, so a changed cart is simply looked up under a new key. The
+``Cart`` methods bump it in the same transaction as the write. Other saves and
+deletes of a ``CartItem`` bump it from the signal handler below, after the
+write; outside ``transaction.atomic()`` that is a separate transaction, and a
+failure between the two leaves the old key serving the old items until the
+entry expires. A reader takes the version before it loads the items, so
+anything it stores is at least as new as its key. Entries expire with
+``TIMEOUT``.
+
+Hits and misses are counted in the cache itself, so the hit rate covers every
+worker process.
+"""
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Cart, aprefetch_products, prefetch_products
+
+KEY_PREFIX = "cart"
+STATS_KEYS = {"hits": "cart-cache:hits", "misses": "cart-cache:misses"}
+TIMEOUT = 60 * 60 * 24
+
+
+def cache_key(cart_pk, version) -> str:
+    return f"{KEY_PREFIX}:{cart_pk}:v{version}"
+
+
+def serialize_cart(cart, items=None) -> dict:
+    """``items`` must have their products attached already when given."""
+    if items is None:
+        items = prefetch_products(cart.items.order_by("pk"))
+    return {
+        "user": cart.pk,
+        "version": cart.version,
+        "total_price": cart.total_price,
+        "total_weight": cart.total_weight,
+        "item_count": cart.item_count,
+        "items": [
+            {
+                "id": item.pk,
+                "product_type": item.product_content_type_id,
+                "product_id": item.product_object_id,
+                "name": item.product.name if item.product else None,
+                "unit_price": item.unit_price,
+                "quantity": item.quantity,
+            }
+            for item in items
+        ],
+    }
+
+
+def _count(outcome) -> None:
+    key = STATS_KEYS[outcome]
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # evicted between add() and incr()
+        cache.add(key, 1, timeout=None)
+
+
+def get_cart(user_pk):
+    """The serialized cart of ``user_pk``, or ``None`` if there is none."""
+    cart = Cart.objects.filter(pk=user_pk).first()
+    if cart is None:
+        return None
+    key = cache_key(cart.pk, cart.version)
+    data = cache.get(key)
+    if data is not None:
+        _count("hits")
+        return data
+    _count("misses")
+    data = serialize_cart(cart)
+    cache.set(key, data, TIMEOUT)
+    return data
+
+
+async def aget_cart(user_pk):
+    """``get_cart`` for async views."""
+    cart = await sync_to_async(Cart.objects.filter(pk=user_pk).first)()
+    if cart is None:
+        return None
+    key = cache_key(cart.pk, cart.version)
+    data = await sync_to_async(cache.get)(key)
+    if data is not None:
+        await sync_to_async(_count)("hits")
+        return data
+    await sync_to_async(_count)("misses")
+    items = await sync_to_async(list)(cart.items.order_by("pk"))
+    data = serialize_cart(cart, await aprefetch_products(items))
+    await sync_to_async(cache.set)(key, data, TIMEOUT)
+    return data
+
+
+def stats() -> dict:
+    counts = cache.get_many(STATS_KEYS.values())
+    hits = counts.get(STATS_KEYS["hits"], 0)
+    misses = counts.get(STATS_KEYS["misses"], 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else None,
+    }
+
+
+def reset_stats() -> None:
+    cache.delete_many(STATS_KEYS.values())
+
+
+def bump_version(sender, instance, **kwargs) -> None:
+    # Writes that bypass the Cart methods still invalidate the cached cart.
+    Cart.objects.filter(pk=instance.cart_id).update(version=F("version") + 1)
@@ -0,0 +1,191 @@
+"""
+Streaming import and export of the product catalog.
+
+``bulk_create`` refuses multi-table inheritance models, so products are
+written in two passes per chunk: the ``Product`` parent rows through
+``bulk_create``, then the child rows (``Book``, ``EBook``, ...) through one
+batched INSERT per product type. Rows are matched on ``sku``: known products
+are updated in bulk and new ones inserted, one transaction per chunk.
+
+Records are dicts with ``sku``, ``type`` (the model name of the product
+type), the ``Product`` fields and the fields of that type.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .models import Product, concrete_subclasses
+
+CHUNK_SIZE = 1000
+PRODUCT_FIELDS = ["name", "price"]
+
+
+def product_types() -> dict:
+    return {model._meta.model_name: model for model in concrete_subclasses(Product)}
+
+
+def type_fields(model) -> list:
+    """Fields a product type adds to ``Product``."""
+    return [
+        field.name
+        for field in model._meta.local_concrete_fields
+        if not field.primary_key
+    ]
+
+
+def columns() -> list:
+    names = ["sku", "type"] + PRODUCT_FIELDS
+    for model in product_types().values():
+        names += [name for name in type_fields(model) if name not in names]
+    return names
+
+
+def read_records(stream, format="csv"):
+    if format == "csv":
+        yield from csv.DictReader(stream)
+    elif format == "jsonl":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unknown catalog format {format!r}")
+
+
+def _clean(model, record, names) -> dict:
+    return {
+        name: model._meta.get_field(name).to_python(record.get(name))
+        for name in names
+    }
+
+
+def _sku_batches(skus, using):
+    """``skus`` in lists that fit the backend's query parameter limit."""
+    skus = list(skus)
+    size = connections[using].features.max_query_params or len(skus) or 1
+    for start in range(0, len(skus), size):
+        yield skus[start:start + size]
+
+
+def _import_chunk(records, types, using) -> tuple:
+    records = {record["sku"]: record for record in records}
+    existing = {
+        product.sku: product
+        for batch in _sku_batches(records, using)
+        for product in Product.objects.using(using)
+        .filter(sku__in=batch)
+        .polymorphic()
+    }
+
+    new_parents, changed_parents, children = [], [], {}
+    for sku, record in records.items():
+        model = types.get(record.get("type"))
+        if model is None:
+            raise ValueError(
+                f"Unknown product type {record.get('type')!r} for {sku}"
+            )
+        product = existing.get(sku)
+        if product is None:
+            fields = _clean(Product, record, PRODUCT_FIELDS)
+            new_parents.append(Product(sku=sku, **fields))
+            continue
+        if type(product) is not model:
+            raise ValueError(
+                f"Product {sku} is a {type(product).__name__}, "
+                f"not a {model.__name__}"
+            )
+        fields = _clean(model, record, PRODUCT_FIELDS + type_fields(model))
+        for name, value in fields.items():
+            setattr(product, name, value)
+        changed_parents.append(product)
+
+    if changed_parents:
+        Product.objects.using(using).bulk_update(changed_parents, PRODUCT_FIELDS)
+        for model in types.values():
+            changed = [p for p in changed_parents if type(p) is model]
+            if changed and type_fields(model):
+                manager = model._base_manager.using(using)
+                manager.bulk_update(changed, type_fields(model))
+
+    if new_parents:
+        Product.objects.using(using).bulk_create(new_parents)
+        if new_parents[0].pk is None:
+            # the backend can't return ids from a bulk insert
+            pks = {
+                sku: pk
+                for batch in _sku_batches([p.sku for p in new_parents], using)
+                for sku, pk in Product.objects.using(using)
+                .filter(sku__in=batch)
+                .values_list("sku", "pk")
+            }
+        else:
+            pks = {parent.sku: parent.pk for parent in new_parents}
+        for parent in new_parents:
+            record = records[parent.sku]
+            model = types[record["type"]]
+            child = model(**_clean(model, record, type_fields(model)))
+            setattr(child, model._meta.pk.attname, pks[parent.sku])
+            children.setdefault(model, []).append(child)
+        for model, objs in children.items():
+            _insert_children(model, objs, using)
+
+    return len(new_parents), len(changed_parents)
+
+
+def _insert_children(model, objs, using) -> None:
+    # The parent rows exist already, so only the child table is written,
+    # in as few INSERT statements as the backend's parameter limit allows.
+    fields = model._meta.local_concrete_fields
+    queryset = model._base_manager.using(using)
+    batch_size = max(connections[using].ops.bulk_batch_size(fields, objs), 1)
+    for start in range(0, len(objs), batch_size):
+        queryset._insert(objs[start:start + batch_size], fields=fields, using=using)
+
+
+def import_products(records, chunk_size=CHUNK_SIZE, using=DEFAULT_DB_ALIAS) -> dict:
+    """
+    Upsert products from an iterable of records, ``chunk_size`` at a time,
+    and return the ``created`` and ``updated`` counts.
+    """
+    records = iter(records)
+    types = product_types()
+    counts = {"created": 0, "updated": 0}
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return counts
+        with transaction.atomic(using=using):
+            created, updated = _import_chunk(chunk, types, using)
+        counts["created"] += created
+        counts["updated"] += updated
+
+
+def export_records(chunk_size=CHUNK_SIZE, using=DEFAULT_DB_ALIAS):
+    """Yield every typed product as a record, holding one chunk in memory."""
+    products = (
+        Product.objects.using(using)
+        .select_subclasses()
+        .order_by("pk")
+        .iterator(chunk_size=chunk_size)
+    )
+    for product in products:
+        record = {"sku": product.sku, "type": product._meta.model_name}
+        for name in PRODUCT_FIELDS + type_fields(type(product)):
+            record[name] = getattr(product, name)
+        yield record
+
+
+def write_records(records, stream, format="csv") -> int:
+    count = 0
+    if format == "csv":
+        writer = csv.DictWriter(stream, fieldnames=columns())
+        writer.writeheader()
+        for count, record in enumerate(records, 1):
+            writer.writerow(record)
+    elif format == "jsonl":
+        for count, record in enumerate(records, 1):
+            stream.write(json.dumps(record) + "\n")
+    else:
+        raise ValueError(f"Unknown catalog format {format!r}")
+    return count
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.shop.catalog import CHUNK_SIZE, export_records, write_records
+
+
+class Command(BaseCommand):
+    help = "Stream the product catalog to a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='output file, or "-" for stdout')
+        parser.add_argument("--format", choices=["csv", "jsonl"])
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or ("jsonl" if path.endswith(".jsonl") else "csv")
+        records = export_records(chunk_size=options["chunk_size"])
+        if path == "-":
+            write_records(records, self.stdout, format)
+            return
+        with open(path, "w", newline="", encoding="utf-8") as stream:
+            count = write_records(records, stream, format)
+        self.stdout.write(self.style.SUCCESS(f"Exported {count} product(s)."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.shop.catalog import CHUNK_SIZE, import_products, read_records
+
+
+class Command(BaseCommand):
+    help = "Create or update products from a CSV or JSON Lines catalog feed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"])
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or ("jsonl" if path.endswith(".jsonl") else "csv")
+        with open(path, newline="", encoding="utf-8") as stream:
+            try:
+                counts = import_products(
+                    read_records(stream, format), chunk_size=options["chunk_size"]
+                )
+            except ValueError as error:
+                raise CommandError(error)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {counts['created']} and updated {counts['updated']} "
+                f"product(s)."
+            )
+        )
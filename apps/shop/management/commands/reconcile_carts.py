@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.shop.models import Cart
+
+
+class Command(BaseCommand):
+    help = "Repair cart totals that drifted from their items."
+
+    def handle(self, *args, **options):
+        repaired = Cart.objects.reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} cart(s)."))
@@ -1,12 +1,18 @@
+from collections import defaultdict
+from itertools import islice
 from random import choices
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.contrib.posgtres.fields import JSONField
+from django.db.models import JSONField
 from django.core.exceptions import ValidationError
 from django.core.validators import URLValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.query import ModelIterable
 
 # use case
 """
@@ -278,10 +284,101 @@ all the common attributes in a single database table.
 """
 
 
+def concrete_subclasses(model) -> list:
+    """
+    Multi-table children of ``model``, found through their parent links so
+    new product types are picked up without registering them. Deeper
+    subclasses come after their parents.
+    """
+    subclasses = []
+    for relation in model._meta.related_objects:
+        if relation.parent_link:
+            subclasses.append(relation.related_model)
+    for subclass in list(subclasses):
+        subclasses.extend(concrete_subclasses(subclass))
+    return subclasses
+
+
+class PolymorphicIterable(ModelIterable):
+    """
+    Yield the most derived instance of every row, loading each subclass with
+    one query per chunk of rows (the whole result unless ``iterator()`` is
+    used).
+    """
+
+    def __iter__(self):
+        queryset = self.queryset
+        rows = super().__iter__()
+        size = self.chunk_size if self.chunked_fetch else None
+        subclasses = queryset._subclasses or concrete_subclasses(queryset.model)
+        annotations = list(queryset.query.annotation_select)
+        while True:
+            chunk = list(islice(rows, size))
+            if not chunk:
+                return
+            pks = [obj.pk for obj in chunk]
+            downcast = {}
+            for subclass in subclasses:
+                # deeper subclasses run later and replace their parents
+                manager = subclass._base_manager.using(queryset.db)
+                downcast.update(manager.in_bulk(pks))
+            for obj in chunk:
+                child = downcast.get(obj.pk, obj)
+                for name in annotations:
+                    setattr(child, name, getattr(obj, name))
+                yield child
+
+
+class ProductQuerySet(models.QuerySet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._subclasses = None
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._subclasses = self._subclasses
+        return clone
+
+    def polymorphic(self) -> "ProductQuerySet":
+        """Return ``Book``/``EBook`` instances instead of bare products."""
+        clone = self._chain()
+        clone._iterable_class = PolymorphicIterable
+        return clone
+
+    def select_subclasses(self, *subclasses) -> "ProductQuerySet":
+        """
+        Keep only products that are one of ``subclasses`` (any subclass when
+        none are given) and return them downcast.
+        """
+        subclasses = subclasses or concrete_subclasses(self.model)
+        condition = Q()
+        for subclass in subclasses:
+            path, model = [], subclass
+            while model is not self.model:
+                model, link = next(iter(model._meta.parents.items()))
+                path.insert(0, link.related_query_name())
+            condition |= Q(**{f"{'__'.join(path)}__isnull": False})
+        clone = self.filter(condition).polymorphic()
+        clone._subclasses = list(subclasses)
+        return clone
+
+    def search(self, q, min_price=None, max_price=None) -> "ProductQuerySet":
+        """
+        Full-text search on name and product kind with prefix matching,
+        ranked best first. See ``apps.shop.search``.
+        """
+        from .search import search
+
+        return search(self, q, min_price=min_price, max_price=max_price)
+
+
 class Product(models.Model):
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=255)
     price = models.PositiveIntegerField(help_text="in cedis")
 
+    objects = ProductQuerySet.as_manager()
+
     def __str__(self) -> str:
         return self.name
 
@@ -324,6 +421,48 @@ total price very quickly.
 """
 
 
+class CartQuerySet(models.QuerySet):
+    def with_products(self) -> "CartQuerySet":
+        """
+        Resolve the products of every item in the selected carts with one
+        query per product type instead of one per item.
+        """
+        return self.prefetch_related(
+            models.Prefetch("items", queryset=CartItem.objects.with_products())
+        )
+
+    def reconcile(self) -> int:
+        """
+        Recompute the running totals from the item snapshots and repair the
+        carts that drifted. Returns the number of carts repaired.
+        """
+        items = CartItem.objects.filter(cart=OuterRef("pk")).values("cart")
+        actual = {
+            field: Coalesce(
+                Subquery(items.annotate(total=Sum(expression)).values("total")), 0
+            )
+            for field, expression in (
+                ("total_price", F("unit_price") * F("quantity")),
+                ("total_weight", F("unit_weight") * F("quantity")),
+                ("item_count", F("quantity")),
+            )
+        }
+        drifted = list(
+            self.annotate(**{f"actual_{name}": value for name, value in actual.items()})
+            .filter(
+                ~Q(total_price=F("actual_total_price"))
+                | ~Q(total_weight=F("actual_total_weight"))
+                | ~Q(item_count=F("actual_item_count"))
+            )
+            .values_list("pk", flat=True)
+        )
+        if drifted:
+            Cart.objects.filter(pk__in=drifted).update(
+                version=F("version") + 1, **actual
+            )
+        return len(drifted)
+
+
 class Cart(models.Model):
     user = models.OneToOneField(
         get_user_model(),
@@ -331,15 +470,164 @@ class Cart(models.Model):
         on_delete=models.CASCADE,
     )
 
+    # running totals, kept in step with the items by ``_update_totals``
+    total_price = models.PositiveIntegerField(default=0, help_text="in cedis")
+    total_weight = models.PositiveIntegerField(default=0, help_text="in grams")
+    item_count = models.PositiveIntegerField(default=0, help_text="units, not lines")
+    # bumped on every change to the cart, see ``apps.shop.cart_cache``
+    version = models.PositiveIntegerField(default=0)
+
+    objects = CartQuerySet.as_manager()
+
     # method to add items to the cart
-    def add_item(self, product) -> 'CartItem': 
-        product_content_type = ContentType.objects.get_for_model(product)
+    def add_item(self, product, quantity=1) -> 'CartItem': 
+        return self.add_items([product], [quantity])[0]
+
+    def add_items(self, products, quantities=None) -> list:
+        """
+        Add many products in a constant number of queries.
+
+        Content types are resolved once per model and repeated products are
+        merged into ``quantity``, both within ``products`` and with the items
+        already in the cart. Returns the created or updated items in the order
+        their products first appear.
+        """
+        products = list(products)
+        if quantities is None:
+            quantities = [1] * len(products)
+        content_types = ContentType.objects.get_for_models(
+            *{type(product) for product in products}
+        )
+
+        wanted = {}
+        for product, quantity in zip(products, quantities):
+            key = (content_types[type(product)].pk, product.pk)
+            if key in wanted:
+                wanted[key][1] += quantity
+            else:
+                wanted[key] = [product, quantity]
+        if not wanted:
+            return []
+
+        with transaction.atomic():
+            existing = {
+                (item.product_content_type_id, item.product_object_id): item
+                for item in CartItem.objects.select_for_update().filter(
+                    cart=self,
+                    product_content_type__in={key[0] for key in wanted},
+                    product_object_id__in={key[1] for key in wanted},
+                )
+            }
+            updated, created = [], []
+            price = weight = count = 0
+            for key, (product, quantity) in wanted.items():
+                item = existing.get(key)
+                if item is None:
+                    item = CartItem(
+                        cart=self,
+                        product_content_type_id=key[0],
+                        product_object_id=key[1],
+                        quantity=quantity,
+                        unit_price=product.price,
+                        unit_weight=getattr(product, "weight", 0),
+                    )
+                    created.append(item)
+                else:
+                    item.quantity += quantity
+                    updated.append(item)
+                price += item.unit_price * quantity
+                weight += item.unit_weight * quantity
+                count += quantity
+
+            # Django 3.2 has no update_conflicts upsert, so merging relies on
+            # the rows locked above and the unique constraint as a backstop.
+            if updated:
+                CartItem.objects.bulk_update(updated, ["quantity"])
+            if created:
+                CartItem.objects.bulk_create(created)
+                if created[0].pk is None:
+                    # the backend can't return ids from a bulk insert
+                    created = CartItem.objects.filter(
+                        cart=self,
+                        product_content_type__in={
+                            item.product_content_type_id for item in created
+                        },
+                        product_object_id__in={
+                            item.product_object_id for item in created
+                        },
+                    )
+                for item in created:
+                    key = (item.product_content_type_id, item.product_object_id)
+                    existing[key] = item
+            self._update_totals(price, weight, count)
+
+        return [existing[key] for key in wanted]
+
+    def _lock_item(self, item: 'CartItem'):
+        """
+        The stored ``(quantity, unit_price, unit_weight)`` of ``item``, locked
+        until the transaction ends, or ``None`` once it's gone. The totals
+        move by these rather than by ``item``, which may be stale.
+        """
+        if item.cart_id != self.pk:
+            raise ValueError(f"{item!r} is not in cart {self.pk}.")
+        return (
+            CartItem.objects.select_for_update()
+            .filter(pk=item.pk, cart=self)
+            .values_list("quantity", "unit_price", "unit_weight")
+            .first()
+        )
 
-        return CartItem.objects.create(
-            cart=self, 
-            product_content_type=product_content_type,
-            product_object_id=product.pk,
+    def remove_item(self, item: 'CartItem') -> None:
+        with transaction.atomic():
+            row = self._lock_item(item)
+            if row is None:
+                return
+            quantity, unit_price, unit_weight = row
+            item.delete()
+            self._update_totals(
+                -unit_price * quantity, -unit_weight * quantity, -quantity
+            )
+
+    def reprice_item(self, item: 'CartItem', price=None) -> 'CartItem':
+        """
+        Snapshot a new unit price for ``item``, the product's current price
+        unless ``price`` is given.
+        """
+        if price is None:
+            price = item.product.price
+        with transaction.atomic():
+            row = self._lock_item(item)
+            if row is None:
+                raise CartItem.DoesNotExist(f"{item!r} was removed.")
+            item.quantity, unit_price, item.unit_weight = row
+            difference = (price - unit_price) * item.quantity
+            item.unit_price = price
+            item.save(update_fields=["unit_price"])
+            self._update_totals(difference, 0, 0)
+        return item
+
+    def _update_totals(self, price, weight, count) -> None:
+        # F() expressions keep concurrent updates from overwriting each other.
+        Cart.objects.filter(pk=self.pk).update(
+            total_price=F("total_price") + price,
+            total_weight=F("total_weight") + weight,
+            item_count=F("item_count") + count,
+            version=F("version") + 1,
         )
+        self.refresh_from_db(
+            fields=["total_price", "total_weight", "item_count", "version"]
+        )
+
+
+class CartItemQuerySet(models.QuerySet):
+    def with_products(self) -> "CartItemQuerySet":
+        """
+        Prefetch ``product`` grouped by content type, so a page of items
+        costs one query per product type rather than one per item.
+        """
+        return self.prefetch_related("product")
+
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items")
@@ -353,7 +641,62 @@ class CartItem(models.Model):
         'product_content_type',
         'product_object_id',
     )
-    
+
+    # inlined when the item is added, so totals never need the products
+    unit_price = models.PositiveIntegerField(default=0, help_text="in cedis")
+    unit_weight = models.PositiveIntegerField(default=0, help_text="in grams")
+    quantity = models.PositiveIntegerField(default=1)
+
+    objects = CartItemQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name="unique_cart_product",
+                fields=["cart", "product_content_type", "product_object_id"],
+            )
+        ]
+
+
+def _group_by_product_type(items) -> dict:
+    items_by_type = defaultdict(list)
+    for item in items:
+        items_by_type[item.product_content_type_id].append(item)
+    return items_by_type
+
+
+def _attach_products(content_type_id, items) -> None:
+    field = CartItem._meta.get_field("product")
+    model = ContentType.objects.get_for_id(content_type_id).model_class()
+    products = model._base_manager.in_bulk({item.product_object_id for item in items})
+    for item in items:
+        product = products.get(item.product_object_id)
+        if product is not None:
+            field.set_cached_value(item, product)
+
+
+def prefetch_products(items) -> list:
+    """
+    Attach ``product`` to already loaded cart items.
+
+    Items are grouped by ``product_content_type`` and every product type is
+    loaded with a single ``in_bulk`` query. Content types come from the
+    ``ContentType`` manager cache, so a warm process does not query them.
+    """
+    items = list(items)
+    for content_type_id, typed_items in _group_by_product_type(items).items():
+        _attach_products(content_type_id, typed_items)
+    return items
+
+
+async def aprefetch_products(items) -> list:
+    """
+    ``prefetch_products`` for async code. The product types are still loaded
+    one after another, since ``sync_to_async`` runs database work on a single
+    thread, but off the event loop and in one hop to that thread.
+    """
+    return await sync_to_async(prefetch_products)(items)
+
 
 # class Cart(models.Model):
 #     user = models.OneToOneField(
@@ -0,0 +1,114 @@
+"""
+Full-text search over the product catalog.
+
+On SQLite the catalog is mirrored into an FTS5 table holding every product's
+name and kind (``book``, ``ebook``, ...). Triggers on the product tables keep
+it in sync, so bulk inserts and queryset updates are indexed as well as
+``save()``. Other backends fall back to ``icontains`` filters.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .models import Product, concrete_subclasses
+
+FTS_TABLE = "shop_product_fts"
+
+
+def _statements() -> list:
+    product = Product._meta.db_table
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"name, kind, tokenize = 'unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {product}_fts_insert AFTER INSERT ON {product} "
+        f"BEGIN INSERT INTO {FTS_TABLE}(rowid, name, kind) "
+        f"VALUES (new.id, new.name, 'product'); END",
+        f"CREATE TRIGGER IF NOT EXISTS {product}_fts_update AFTER UPDATE OF name "
+        f"ON {product} BEGIN UPDATE {FTS_TABLE} SET name = new.name "
+        f"WHERE rowid = new.id; END",
+        f"CREATE TRIGGER IF NOT EXISTS {product}_fts_delete AFTER DELETE ON {product} "
+        f"BEGIN DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END",
+    ]
+    for subclass in concrete_subclasses(Product):
+        table = subclass._meta.db_table
+        parent = subclass._meta.pk.column
+        kind = subclass._meta.model_name
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} "
+            f"BEGIN UPDATE {FTS_TABLE} SET kind = '{kind}' "
+            f"WHERE rowid = new.{parent}; END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} "
+            f"BEGIN UPDATE {FTS_TABLE} SET kind = 'product' "
+            f"WHERE rowid = old.{parent}; END",
+        ]
+    return statements
+
+
+def install(using=DEFAULT_DB_ALIAS) -> None:
+    """Create the FTS table and its triggers if they don't exist yet."""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for statement in _statements():
+            cursor.execute(statement)
+
+
+def rebuild(using=DEFAULT_DB_ALIAS) -> None:
+    """Re-index the whole catalog, e.g. for rows written before install()."""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    install(using)
+    product = Product._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, name, kind) "
+            f"SELECT id, name, 'product' FROM {product}"
+        )
+        for subclass in concrete_subclasses(Product):
+            cursor.execute(
+                f"UPDATE {FTS_TABLE} SET kind = %s WHERE rowid IN "
+                f"(SELECT {subclass._meta.pk.column} FROM {subclass._meta.db_table})",
+                [subclass._meta.model_name],
+            )
+
+
+def install_after_migrate(sender, using=DEFAULT_DB_ALIAS, **kwargs) -> None:
+    install(using)
+
+
+def terms(q) -> list:
+    return re.findall(r"\w+", q or "")
+
+
+def match_expression(q) -> str:
+    """Every word of ``q`` as a quoted prefix term, e.g. ``"harr"* "pot"*``."""
+    return " ".join(f'"{term}"*' for term in terms(q))
+
+
+def search(queryset, q, min_price=None, max_price=None):
+    """
+    Products matching every word of ``q`` as a prefix, best match first.
+    Matches carry their ``search_rank`` (BM25, lower is better).
+    """
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+    if not terms(q):
+        return queryset.none()
+
+    if connections[queryset.db].vendor != "sqlite":
+        for term in terms(q):
+            queryset = queryset.filter(name__icontains=term)
+        return queryset
+
+    product = Product._meta.db_table
+    return queryset.extra(
+        select={"search_rank": f"bm25({FTS_TABLE})"},
+        tables=[FTS_TABLE],
+        where=[f"{FTS_TABLE} MATCH %s", f"{FTS_TABLE}.rowid = {product}.id"],
+        params=[match_expression(q)],
+    ).order_by("search_rank")
@@ -0,0 +1,102 @@
+"""
+Delivery fee quotes for many carts at once.
+
+Weights are summed per cart in the database, so a batch of carts costs a few
+grouped queries no matter how many items they hold, and the fee for each
+cart is a binary search over the tiers of its zone's rate table. Virtual
+products have no weight and never add to the fee.
+"""
+from bisect import bisect_left
+from math import ceil
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import F, OuterRef, Subquery, Sum
+
+from .models import Cart, CartItem, Product, concrete_subclasses
+
+BATCH_SIZE = 500
+
+
+class RateTable:
+    """
+    Tiered delivery fees.
+
+    ``tiers`` is a list of ``(max_grams, fee)`` pairs. Heavier parcels pay
+    the last fee plus ``per_kg_over`` for every started kilogram above the
+    last tier. An empty parcel ships for free.
+    """
+
+    def __init__(self, tiers, per_kg_over=0):
+        tiers = sorted(tiers)
+        self.limits = [limit for limit, _ in tiers]
+        self.fees = [fee for _, fee in tiers]
+        self.per_kg_over = per_kg_over
+
+    def fee(self, weight) -> int:
+        if weight <= 0:
+            return 0
+        index = bisect_left(self.limits, weight)
+        if index < len(self.limits):
+            return self.fees[index]
+        overweight = ceil((weight - self.limits[-1]) / 1000)
+        return self.fees[-1] + overweight * self.per_kg_over
+
+
+def physical_product_models() -> list:
+    """Product types that carry a ``weight``."""
+    return [
+        model
+        for model in concrete_subclasses(Product)
+        if any(field.name == "weight" for field in model._meta.local_fields)
+    ]
+
+
+def cart_weights(cart_pks, live=False) -> dict:
+    """
+    Total parcel weight in grams for every cart in ``cart_pks``.
+
+    By default this reads the running ``Cart.total_weight``. With ``live``
+    the weights come from the current product rows instead of the snapshots
+    taken when the items were added.
+    """
+    weights = {}
+    cart_pks = list(cart_pks)
+    for start in range(0, len(cart_pks), BATCH_SIZE):
+        batch = cart_pks[start:start + BATCH_SIZE]
+        if not live:
+            weights.update(
+                Cart.objects.filter(pk__in=batch).values_list("pk", "total_weight")
+            )
+            continue
+        weights.update(dict.fromkeys(batch, 0))
+        for model in physical_product_models():
+            product_weight = model._base_manager.filter(
+                pk=OuterRef("product_object_id")
+            ).values("weight")
+            rows = (
+                CartItem.objects.filter(
+                    cart__in=batch,
+                    product_content_type=ContentType.objects.get_for_model(model),
+                )
+                .annotate(line_weight=Subquery(product_weight) * F("quantity"))
+                .values("cart")
+                .annotate(weight=Sum("line_weight"))
+                .values_list("cart", "weight")
+            )
+            for cart_pk, weight in rows:
+                weights[cart_pk] += weight or 0
+    return weights
+
+
+def quote_carts(carts, rates, zones=None, live=False) -> dict:
+    """
+    Delivery fee for every cart, keyed by cart pk.
+
+    ``rates`` is a ``RateTable``, or a mapping of zone to ``RateTable`` used
+    together with ``zones``, a mapping of cart pk to zone.
+    """
+    cart_pks = [getattr(cart, "pk", cart) for cart in carts]
+    weights = cart_weights(cart_pks, live=live)
+    if isinstance(rates, RateTable):
+        return {pk: rates.fee(weight) for pk, weight in weights.items()}
+    return {pk: rates[zones[pk]].fee(weight) for pk, weight in weights.items()}
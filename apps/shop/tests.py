@@ -1,3 +1,454 @@
+import io
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.contenttypes import warm_at_startup, warm_content_types
+
+from . import cart_cache
+from .catalog import export_records, import_products, read_records, write_records
+from .models import Book, Cart, CartItem, EBook, Product, prefetch_products
+from .search import rebuild
+from .shipping import RateTable, quote_carts
+
+
+class ShopTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.users = [User.objects.create(username=f"user{i}") for i in range(3)]
+        cls.carts = [Cart.objects.create(user=user) for user in cls.users]
+        cls.books = [
+            Book.objects.create(name=f"Book {i}", price=10 + i, weight=200 + i)
+            for i in range(5)
+        ]
+        cls.ebooks = [
+            EBook.objects.create(
+                name=f"EBook {i}",
+                price=5 + i,
+                download_link=f"https://example.com/{i}",
+            )
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        # Warm the per-process cache so query counts only cover products.
+        ContentType.objects.get_for_models(Book, EBook)
+
+
+class ProductPrefetchTests(ShopTestCase):
+    def fill_carts(self):
+        for cart in self.carts:
+            for product in self.books + self.ebooks:
+                cart.add_item(product)
+
+    def test_cart_items_resolve_products_per_type(self):
+        self.fill_carts()
+        with self.assertNumQueries(3):
+            items = list(CartItem.objects.with_products())
+            products = [item.product for item in items]
+        self.assertEqual(len(products), 30)
+        self.assertIsInstance(products[0], Book)
+        self.assertEqual(sum(isinstance(p, EBook) for p in products), 15)
+
+    def test_page_of_carts(self):
+        self.fill_carts()
+        with self.assertNumQueries(4):
+            carts = list(Cart.objects.with_products())
+            names = [
+                item.product.name for cart in carts for item in cart.items.all()
+            ]
+        self.assertEqual(len(names), 30)
+
+    def test_prefetch_products_on_loaded_items(self):
+        self.fill_carts()
+        items = list(self.carts[0].items.all())
+        with self.assertNumQueries(2):
+            prefetch_products(items)
+            weights = [item.product.weight for item in items[:5]]
+        self.assertEqual(weights, [200, 201, 202, 203, 204])
+
+
+class CartTotalsTests(ShopTestCase):
+    def test_totals_follow_item_changes(self):
+        cart = self.carts[0]
+        book_item = cart.add_item(self.books[0])
+        cart.add_item(self.ebooks[0])
+        self.assertEqual(
+            (cart.total_price, cart.total_weight, cart.item_count), (15, 200, 2)
+        )
+
+        cart.reprice_item(book_item, 20)
+        cart.remove_item(cart.items.get(unit_price=5))
+        cart = Cart.objects.get(pk=cart.pk)
+        self.assertEqual(
+            (cart.total_price, cart.total_weight, cart.item_count), (20, 200, 1)
+        )
+
+    def test_stale_items_move_totals_by_the_stored_row(self):
+        cart = self.carts[0]
+        item = cart.add_item(self.books[0])
+        cart.add_item(self.books[0])
+        self.assertEqual(item.quantity, 1)
+
+        cart.reprice_item(item, 12)
+        self.assertEqual(item.quantity, 2)
+        self.assertEqual((cart.total_price, cart.item_count), (24, 2))
+
+        stale = CartItem.objects.get(pk=item.pk)
+        cart.remove_item(item)
+        cart.remove_item(stale)
+        self.assertEqual(
+            (cart.total_price, cart.total_weight, cart.item_count), (0, 0, 0)
+        )
+        self.assertEqual(Cart.objects.reconcile(), 0)
+
+    def test_items_of_another_cart_are_refused(self):
+        item = self.carts[1].add_item(self.books[0])
+        with self.assertRaises(ValueError):
+            self.carts[0].remove_item(item)
+        self.assertTrue(CartItem.objects.filter(pk=item.pk).exists())
+
+    def test_reconcile_repairs_drift(self):
+        cart = self.carts[0]
+        cart.add_item(self.books[1])
+        self.carts[1].add_item(self.books[2])
+        Cart.objects.filter(pk=cart.pk).update(total_price=0, item_count=7)
+
+        self.assertEqual(Cart.objects.reconcile(), 1)
+        cart.refresh_from_db()
+        self.assertEqual(
+            (cart.total_price, cart.total_weight, cart.item_count), (11, 201, 1)
+        )
+        self.assertEqual(Cart.objects.reconcile(), 0)
+
+
+class AddItemsTests(ShopTestCase):
+    def test_duplicates_merge_into_quantity(self):
+        cart = self.carts[0]
+        cart.add_item(self.books[0])
+        products = self.books * 40 + self.ebooks[:2]
+        with self.assertNumQueries(8):
+            items = cart.add_items(products)
+
+        self.assertEqual(len(items), 7)
+        self.assertEqual(items[0].quantity, 41)
+        self.assertEqual([item.quantity for item in items[1:]], [40] * 4 + [1, 1])
+        self.assertTrue(all(item.pk for item in items))
+        self.assertEqual(cart.items.count(), 7)
+        self.assertEqual(cart.item_count, 203)
+        self.assertEqual(cart.total_weight, 41 * 200 + 40 * (201 + 202 + 203 + 204))
+
+    def test_explicit_quantities(self):
+        cart = self.carts[1]
+        items = cart.add_items([self.books[0], self.ebooks[0]], quantities=[3, 2])
+        self.assertEqual([item.quantity for item in items], [3, 2])
+        self.assertEqual(cart.total_price, 3 * 10 + 2 * 5)
+
+        cart.remove_item(items[0])
+        self.assertEqual(
+            (cart.total_price, cart.total_weight, cart.item_count), (10, 0, 2)
+        )
+        self.assertEqual(Cart.objects.reconcile(), 0)
+
+
+class PolymorphicProductTests(ShopTestCase):
+    def test_products_are_downcast_per_subclass(self):
+        with self.assertNumQueries(3):
+            products = list(Product.objects.polymorphic().order_by("name"))
+            weights = [p.weight for p in products if isinstance(p, Book)]
+            links = [p.download_link for p in products if isinstance(p, EBook)]
+        self.assertEqual(len(products), 10)
+        self.assertEqual(weights, [200, 201, 202, 203, 204])
+        self.assertEqual(len(links), 5)
+
+    def test_select_subclasses(self):
+        Product.objects.create(name="Gift card", price=50)
+        with self.assertNumQueries(2):
+            products = list(Product.objects.select_subclasses(EBook))
+        self.assertEqual(len(products), 5)
+        self.assertTrue(all(isinstance(p, EBook) for p in products))
+        self.assertEqual(Product.objects.select_subclasses().count(), 10)
+        self.assertEqual(Product.objects.polymorphic().count(), 11)
+
+    def test_iterator_downcasts_in_chunks(self):
+        products = Product.objects.polymorphic().annotate(doubled=F("price") * 2)
+        with self.assertNumQueries(7):
+            products = list(products.order_by("pk").iterator(chunk_size=4))
+        self.assertIsInstance(products[0], Book)
+        self.assertEqual(products[0].doubled, 20)
+
+
+class ContentTypeWarmingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ContentType.objects.clear_cache()
+
+    def test_warm_worker_skips_content_type_queries(self):
+        with self.assertNumQueries(1):
+            self.assertGreater(warm_content_types(), 0)
+        with self.assertNumQueries(0):
+            ContentType.objects.get_for_model(Book)
+            ContentType.objects.get_for_id(ContentType.objects.get_for_model(EBook).pk)
+
+    def test_new_worker_reads_published_map(self):
+        warm_content_types()
+        ContentType.objects.clear_cache()
+        with self.assertNumQueries(0):
+            warm_content_types()
+            ContentType.objects.get_for_model(Cart)
+
+    def test_map_is_keyed_by_database(self):
+        warm_content_types()
+        ContentType.objects.clear_cache()
+        settings_dict = dict(connection.settings_dict, NAME="restored")
+        with patch.object(connection, "settings_dict", settings_dict):
+            with self.assertNumQueries(1):
+                warm_content_types()
+
+    def test_startup_survives_unreachable_database(self):
+        with patch.object(ContentType.objects, "using", side_effect=DatabaseError):
+            warm_at_startup()
+        self.assertEqual(ContentType.objects._cache, {})
+
+
+class ShippingQuoteTests(ShopTestCase):
+    rates = RateTable([(500, 10), (2000, 20)], per_kg_over=5)
+
+    def test_rate_table_tiers(self):
+        fees = [self.rates.fee(weight) for weight in (0, 1, 500, 501, 2000, 3500)]
+        self.assertEqual(fees, [0, 10, 10, 20, 20, 30])
+
+    def test_quotes_skip_virtual_products(self):
+        self.carts[0].add_items([self.books[0], self.ebooks[0]], [2, 3])
+        self.carts[1].add_items([self.books[0]] * 11)
+        self.carts[2].add_item(self.ebooks[1])
+
+        with self.assertNumQueries(1):
+            quotes = quote_carts(self.carts, self.rates)
+        self.assertEqual(list(quotes.values()), [10, 25, 0])
+
+    def test_live_weights_and_zones(self):
+        self.carts[0].add_items([self.books[0], self.ebooks[0]], [2, 3])
+        Book.objects.filter(pk=self.books[0].pk).update(weight=300)
+        rates = {"local": self.rates, "abroad": RateTable([(1000, 50)])}
+        zones = {self.carts[0].pk: "local", self.carts[1].pk: "abroad"}
+
+        with self.assertNumQueries(1):
+            quotes = quote_carts(self.carts[:2], rates, zones, live=True)
+        self.assertEqual(quotes, {self.carts[0].pk: 20, self.carts[1].pk: 0})
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.wizard = Book.objects.create(
+            name="The Wizard of Earthsea", price=30, weight=300
+        )
+        cls.wizards = EBook.objects.create(
+            name="Wizards and Wizardry", price=12, download_link="https://example.com/w"
+        )
+        cls.cookbook = Book.objects.create(
+            name="Earthly Delights", price=45, weight=900
+        )
+
+    def test_prefix_match_ranked(self):
+        results = list(Product.objects.search("wiz"))
+        self.assertEqual(results, [self.wizards.product_ptr, self.wizard.product_ptr])
+        self.assertLess(results[0].search_rank, results[1].search_rank)
+
+    def test_all_terms_and_kind_match(self):
+        self.assertEqual(
+            list(Product.objects.search("earth wizard")), [self.wizard.product_ptr]
+        )
+        self.assertEqual(
+            list(Product.objects.search("ebook")), [self.wizards.product_ptr]
+        )
+        self.assertFalse(Product.objects.search("  ").exists())
+
+    def test_price_range(self):
+        results = Product.objects.search("earth", min_price=40, max_price=50)
+        self.assertEqual(list(results), [self.cookbook.product_ptr])
+
+    def test_index_follows_writes(self):
+        Product.objects.filter(pk=self.cookbook.pk).update(name="Garden Recipes")
+        self.assertFalse(Product.objects.search("delights").exists())
+        self.assertTrue(Product.objects.search("recipe").exists())
+        self.wizard.delete()
+        self.assertEqual(Product.objects.search("wizard").count(), 1)
+
+    def test_rebuild(self):
+        rebuild()
+        self.assertEqual(Product.objects.search("book").count(), 2)
+
+
+class CatalogImportExportTests(TestCase):
+    feed = (
+        "sku,type,name,price,weight,download_link\n"
+        "B-1,book,Dune,40,700,\n"
+        "B-2,book,Emma,25,350,\n"
+        "E-1,ebook,Ulysses,9,,https://example.com/ulysses\n"
+    )
+
+    def test_import_creates_parent_and_child_rows(self):
+        with self.assertNumQueries(7):
+            counts = import_products(read_records(io.StringIO(self.feed)))
+        self.assertEqual(counts, {"created": 3, "updated": 0})
+        self.assertEqual(Book.objects.get(sku="B-2").weight, 350)
+        self.assertEqual(
+            EBook.objects.get(sku="E-1").download_link, "https://example.com/ulysses"
+        )
+        self.assertEqual(
+            list(Product.objects.search("ebook")), [Product.objects.get(sku="E-1")]
+        )
+
+    def test_import_upserts_on_sku(self):
+        import_products(read_records(io.StringIO(self.feed)), chunk_size=2)
+        update = (
+            '{"sku": "B-1", "type": "book", "name": "Dune", "price": 45, '
+            '"weight": 720}\n'
+            '{"sku": "B-3", "type": "book", "name": "Beloved", "price": 30, '
+            '"weight": 500}\n'
+        )
+        counts = import_products(read_records(io.StringIO(update), "jsonl"))
+        self.assertEqual(counts, {"created": 1, "updated": 1})
+        book = Book.objects.get(sku="B-1")
+        self.assertEqual((book.price, book.weight), (45, 720))
+        self.assertEqual(Product.objects.count(), 4)
+
+    def test_sku_lookups_fit_the_parameter_limit(self):
+        records = [
+            {"sku": f"B-{i}", "type": "book", "name": "Book", "price": i, "weight": 1}
+            for i in range(25)
+        ]
+        with patch.object(connection.features, "max_query_params", 10):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(
+                    import_products(records), {"created": 25, "updated": 0}
+                )
+                self.assertEqual(
+                    import_products(records), {"created": 0, "updated": 25}
+                )
+        lookups = [q["sql"] for q in queries if '"sku" IN (' in q["sql"]]
+        self.assertTrue(lookups)
+        self.assertTrue(all(sql.count("'B-") <= 10 for sql in lookups))
+
+    def test_import_rejects_type_change(self):
+        import_products(read_records(io.StringIO(self.feed)))
+        record = {"sku": "B-1", "type": "ebook", "name": "Dune", "price": 1}
+        with self.assertRaises(ValueError):
+            import_products([record])
+
+    def test_export_round_trip(self):
+        import_products(read_records(io.StringIO(self.feed)))
+        stream = io.StringIO()
+        self.assertEqual(write_records(export_records(chunk_size=2), stream), 3)
+        self.assertEqual(stream.getvalue().replace("\r\n", "\n"), self.feed)
+
+
+class CartCacheTests(ShopTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_read_through_and_stats(self):
+        cart = self.carts[0]
+        cart.add_items([self.books[0], self.ebooks[0]])
+        with self.assertNumQueries(4):
+            data = cart_cache.get_cart(cart.pk)
+        self.assertEqual(
+            [item["name"] for item in data["items"]], ["Book 0", "EBook 0"]
+        )
+        self.assertEqual(data["total_price"], 15)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(cart_cache.get_cart(cart.pk), data)
+        self.assertEqual(
+            cart_cache.stats(), {"hits": 1, "misses": 1, "hit_rate": 0.5}
+        )
+        self.assertIsNone(cart_cache.get_cart(self.users[0].pk + 100))
+
+    def test_every_item_write_invalidates(self):
+        cart = self.carts[1]
+        item = cart.add_item(self.books[1])
+        cart_cache.get_cart(cart.pk)
+
+        cart.add_item(self.books[1])
+        self.assertEqual(cart_cache.get_cart(cart.pk)["items"][0]["quantity"], 2)
+
+        item.refresh_from_db()
+        item.quantity = 5
+        item.save()
+        self.assertEqual(cart_cache.get_cart(cart.pk)["items"][0]["quantity"], 5)
+
+        CartItem.objects.filter(pk=item.pk).delete()
+        self.assertEqual(cart_cache.get_cart(cart.pk)["items"], [])
+        self.assertEqual(cart_cache.stats()["hits"], 0)
+
+
+class AsyncViewTests(ShopTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.async_client.force_login(self.users[0])
+
+    async def test_add_item_and_read_cart(self):
+        url = reverse("shop:cart-add-item")
+        for quantity in (2, 1):
+            response = await self.async_client.post(
+                url,
+                {"product": self.books[0].pk, "quantity": quantity},
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["quantity"], 3)
+
+        response = await self.async_client.get(reverse("shop:cart-detail"))
+        data = response.json()
+        self.assertEqual(data["item_count"], 3)
+        self.assertEqual(data["items"][0]["name"], "Book 0")
+
+    async def test_add_item_errors(self):
+        url = reverse("shop:cart-add-item")
+        response = await self.async_client.post(
+            url, {"product": 0}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.post(
+            url, {"quantity": 1}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_anonymous_cart(self):
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.get(reverse("shop:cart-detail"))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_product_list(self):
+        url = reverse("shop:product-list")
+        response = await self.async_client.get(url)
+        data = response.json()
+        self.assertEqual(len(data["results"]), 10)
+        self.assertEqual(data["results"][0]["weight"], 200)
+        self.assertIsNone(data["next"])
+
+        with patch("apps.shop.views.PAGE_SIZE", 9):
+            response = await self.async_client.get(url)
+            response = await self.async_client.get(
+                f"{url}?cursor={response.json()['next']}"
+            )
+        self.assertEqual(response.json()["results"][0]["type"], "ebook")
+        response = await self.async_client.get(f"{url}?cursor=nonsense")
+        self.assertEqual(response.status_code, 400)
 
-# Create your tests here.
+        response = await self.async_client.get(f"{url}?q=ebook+3")
+        names = [product["name"] for product in response.json()["results"]]
+        self.assertEqual(names, ["EBook 3"])
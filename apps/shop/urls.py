@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import views
+
+app_name = "shop"
+
+urlpatterns = [
+    path("cart/", views.cart_detail, name="cart-detail"),
+    path("cart/items/", views.cart_add_item, name="cart-add-item"),
+    path("products/", views.product_list, name="product-list"),
+]
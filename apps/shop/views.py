@@ -1,3 +1,103 @@
-from django.shortcuts import render
+"""
+Async cart and catalog endpoints.
 
-# Create your views here.
+Django 3.2 has no async ORM, so database work runs through ``sync_to_async``
+while the event loop keeps serving other requests.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse
+
+from core.pagination import InvalidCursor, KeysetPaginator, page_data
+
+from .cart_cache import aget_cart
+from .models import Cart, Product
+
+PAGE_SIZE = 50
+
+
+@sync_to_async
+def _user(request):
+    # ``request.user`` loads the session and the user lazily, which must
+    # happen outside the event loop.
+    user = request.user
+    return user if user.is_authenticated else None
+
+
+def _product_data(product) -> dict:
+    data = {
+        "id": product.pk,
+        "type": product._meta.model_name,
+        "name": product.name,
+        "price": product.price,
+    }
+    if hasattr(product, "weight"):
+        data["weight"] = product.weight
+    if hasattr(product, "download_link"):
+        data["download_link"] = product.download_link
+    return data
+
+
+async def cart_detail(request):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    user = await _user(request)
+    if user is None:
+        return JsonResponse({"error": "authentication required"}, status=401)
+    data = await aget_cart(user.pk)
+    if data is None:
+        data = {"user": user.pk, "total_price": 0, "item_count": 0, "items": []}
+    return JsonResponse(data)
+
+
+@sync_to_async
+def _add_item(user, product_pk, quantity):
+    product = Product.objects.polymorphic().filter(pk=product_pk).first()
+    if product is None:
+        return None
+    cart, _ = Cart.objects.get_or_create(user=user)
+    return cart.add_item(product, quantity)
+
+
+async def cart_add_item(request):
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    user = await _user(request)
+    if user is None:
+        return JsonResponse({"error": "authentication required"}, status=401)
+    try:
+        payload = json.loads(request.body)
+        product_pk = int(payload["product"])
+        quantity = int(payload.get("quantity", 1))
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "invalid payload"}, status=400)
+    if quantity < 1:
+        return JsonResponse({"error": "quantity must be positive"}, status=400)
+
+    item = await _add_item(user, product_pk, quantity)
+    if item is None:
+        return JsonResponse({"error": "unknown product"}, status=404)
+    return JsonResponse(
+        {"id": item.pk, "product": product_pk, "quantity": item.quantity}, status=201
+    )
+
+
+async def product_list(request):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    products = Product.objects.polymorphic()
+    query = request.GET.get("q")
+    if query:
+        # ranked results have no stable key to continue from
+        page = await sync_to_async(list)(products.search(query)[:PAGE_SIZE])
+        return JsonResponse({"results": [_product_data(p) for p in page]})
+
+    paginator = KeysetPaginator(products, PAGE_SIZE, ordering=["pk"])
+    try:
+        data = await sync_to_async(page_data)(
+            paginator, request.GET.get("cursor"), _product_data
+        )
+    except InvalidCursor:
+        return JsonResponse({"error": "invalid cursor"}, status=400)
+    return JsonResponse(data)
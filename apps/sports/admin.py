@@ -1,3 +1,15 @@
 from django.contrib import admin
 
-# Register your models here.
+from core.admin import KeysetPaginationMixin
+
+from .models import TeamMember
+
+
+class TeamMemberAdmin(KeysetPaginationMixin, admin.ModelAdmin):
+    list_display = ['person', 'team', 'role', 'joined', 'departed']
+    list_select_related = ['person', 'team']
+    raw_id_fields = ['person', 'team']
+    list_filter = ['role']
+
+
+admin.site.register(TeamMember, TeamMemberAdmin)
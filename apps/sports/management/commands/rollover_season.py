@@ -0,0 +1,52 @@
+import datetime
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.sports.rollover import rollover
+
+
+def date(value):
+    return datetime.date.fromisoformat(value)
+
+
+class Command(BaseCommand):
+    help = (
+        'Close all open memberships at the end of a season and reopen the '
+        'retained ones for the next.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('season_end', type=date, help='YYYY-MM-DD')
+        parser.add_argument('season_start', type=date, help='YYYY-MM-DD')
+        parser.add_argument(
+            '--retain',
+            help='JSON file mapping team_members, league_teams and '
+            'league_umpires to lists of membership ids to renew',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        retained = {}
+        if options['retain']:
+            with open(options['retain'], encoding='utf-8') as stream:
+                retained = json.load(stream)
+        try:
+            report = rollover(
+                options['season_end'],
+                options['season_start'],
+                retained=retained,
+                dry_run=options['dry_run'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        close, reopen = ('Would close', 'reopen') if options['dry_run'] else (
+            'Closed',
+            'reopened',
+        )
+        for key, counts in report.items():
+            self.stdout.write(
+                f"{close} {counts['closed']} and {reopen} {counts['reopened']} "
+                f"{key.replace('_', ' ')}."
+            )
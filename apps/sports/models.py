@@ -1,3 +1,5 @@
+from collections import namedtuple
+
 from django.db import models
 
 '''
@@ -11,6 +13,11 @@ sometimes more than one at a time (e.g. player-coach).
 
 COACH = 'C'
 PLAYER = 'P'
+UMPIRE = 'U'
+
+TimelineEntry = namedtuple(
+    'TimelineEntry', ['role', 'organisation', 'joined', 'departed']
+)
 
 
 class Person(models.Model):
@@ -22,18 +29,61 @@ class Person(models.Model):
     def __str__(self):
         return self.name
 
+    def timeline(self, offset=0, limit=None):
+        '''
+        Every role this person held, oldest first, as ``TimelineEntry``
+        records; one query for any page of the history.
+        '''
+        entries = timeline_queryset([self.pk])
+        end = None if limit is None else offset + limit
+        return [TimelineEntry(*row[1:]) for row in entries[offset:end]]
+
+
+def current_members_prefetch():
+    '''
+    Prefetch the current TeamMember rows of a page of teams, with their
+    people, into ``team.current_members``.
+    '''
+    return models.Prefetch(
+        'members',
+        queryset=TeamMember.objects.current()
+        .select_related('person')
+        .order_by('person__name'),
+        to_attr='current_members',
+    )
+
+
+class TeamQuerySet(models.QuerySet):
+    def with_rosters(self):
+        return self.prefetch_related(current_members_prefetch())
+
 
 class Team(models.Model):
     name = models.CharField(max_length=255)
 
+    objects = TeamQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
+    def _current(self, role) -> list:
+        '''
+        The team's current people in ``role`` by name, from the prefetched
+        ``current_members`` when ``with_rosters()`` loaded them.
+        '''
+        if hasattr(self, 'current_members'):
+            return [m.person for m in self.current_members if m.role == role]
+        return list(Person.objects.filter(
+            teammember__team=self,
+            teammember__role=role,
+            teammember__departed=None,
+        ).order_by('name'))
+
     def current_coaches(self):
-        return Person.objects.filter(teammenber__team=self, temmember__role=COACH, teammember__departed=None).order_by('name')
+        return self._current(COACH)
 
     def current_players(self):
-        return Person.objects.filter(teammenber__team=self, temmember__role=PLAYER, teammember__departed=None).order_by('name')
+        return self._current(PLAYER)
 
 
 class League(models.Model):
@@ -44,6 +94,34 @@ class League(models.Model):
     def __str__(self):
         return self.name
 
+    def rosters(self):
+        '''Rosters of the league's current teams, see ``load_rosters``.'''
+        return load_rosters(
+            LeagueTeam.objects.current().filter(league=self).values('team')
+        )
+
+
+class MembershipQuerySet(models.QuerySet):
+    '''
+    Date queries over membership periods. A period runs from ``joined`` up to,
+    but not including, ``departed``; an empty ``departed`` is still open.
+    '''
+
+    def current(self):
+        return self.filter(departed=None)
+
+    def as_of(self, date):
+        '''Memberships held on ``date``.'''
+        return self.filter(
+            models.Q(departed=None) | models.Q(departed__gt=date), joined__lte=date
+        )
+
+    def overlapping(self, start, end):
+        '''Memberships held on any day from ``start`` to ``end`` inclusive.'''
+        return self.filter(
+            models.Q(departed=None) | models.Q(departed__gt=start), joined__lte=end
+        )
+
 
 class Membership(models.Model):
     '''
@@ -54,6 +132,8 @@ class Membership(models.Model):
     joined = models.DateField()
     departed = models.DateField(null=True, blank=True)
 
+    objects = MembershipQuerySet.as_manager()
+
     class Meta:
         abstract = True 
 
@@ -67,30 +147,106 @@ class Membership(models.Model):
 
 
 class LeagueMembership(Membership):
-    league = models.ForeignKey(League)
+    league = models.ForeignKey(League, on_delete=models.CASCADE)
 
     class Meta:
         abstract = True
+        indexes = [
+            models.Index(
+                fields=['league', 'joined', 'departed'],
+                name='%(app_label)s_%(class)s_span',
+            )
+        ]
 
 
 class LeagueTeam(LeagueMembership):
-    team = models.ForeignKey(Team)
+    team = models.ForeignKey(Team, on_delete=models.CASCADE)
 
     def __str__(self):
         return self.team
 
 
 class LeagueUmpire(LeagueMembership):
-    umpire = models.ForeignKey(Person)
+    umpire = models.ForeignKey(Person, on_delete=models.CASCADE)
 
     def __str__(self):
         return self.umpire
 
 
 class TeamMember(Membership):
-    team = models.ForeignKey(Team, related_name='members')
-    person = models.ForeignKey(Person)
+    team = models.ForeignKey(Team, related_name='members', on_delete=models.CASCADE)
+    person = models.ForeignKey(Person, on_delete=models.CASCADE)
     role = models.CharField(max_length=2, choices=((COACH, 'coach'), (PLAYER, 'player')))
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['team', 'joined', 'departed'], name='sports_teammember_span'
+            )
+        ]
+
     def __str__(self):
-        return self.team, self.person
\ No newline at end of file
+        return f'{self.person} ({self.get_role_display()}) of {self.team}'
+
+
+def load_rosters(teams):
+    '''
+    Current coaches and players of many teams in one query, as
+    ``{team_pk: {'coaches': [...], 'players': [...]}}`` ordered by name.
+    ``teams`` may be Team instances, pks or a queryset of team pks.
+    '''
+    if not isinstance(teams, models.QuerySet):
+        teams = [getattr(team, 'pk', team) for team in teams]
+    members = (
+        TeamMember.objects.current().filter(team__in=teams)
+        .select_related('person')
+        .order_by('person__name')
+    )
+    rosters = {}
+    for member in members:
+        roster = rosters.setdefault(member.team_id, {'coaches': [], 'players': []})
+        roster['coaches' if member.role == COACH else 'players'].append(member.person)
+    if isinstance(teams, list):
+        for pk in teams:
+            rosters.setdefault(pk, {'coaches': [], 'players': []})
+    return rosters
+
+
+def timeline_queryset(people):
+    '''
+    Team and league memberships of ``people`` as one UNION query of
+    ``(person, role, organisation, joined, departed)`` rows ordered by
+    person and date. ``people`` may be pks or a queryset of pks.
+    '''
+    # Columns are all annotations, defined in the same order on both sides,
+    # so the two SELECT lists line up.
+    team_roles = TeamMember.objects.filter(person__in=people).annotate(
+        who=models.F('person'),
+        what=models.F('role'),
+        org=models.F('team__name'),
+        start=models.F('joined'),
+        end=models.F('departed'),
+    )
+    umpiring = LeagueUmpire.objects.filter(umpire__in=people).annotate(
+        who=models.F('umpire'),
+        what=models.Value(UMPIRE, output_field=models.CharField()),
+        org=models.F('league__name'),
+        start=models.F('joined'),
+        end=models.F('departed'),
+    )
+    columns = ['who', 'what', 'org', 'start', 'end']
+    return (
+        team_roles.values_list(*columns)
+        .union(umpiring.values_list(*columns), all=True)
+        .order_by('who', 'start', 'what', 'org')
+    )
+
+
+def timelines(people):
+    '''``Person.timeline`` for many people in one query, keyed by person pk.'''
+    if not isinstance(people, models.QuerySet):
+        people = [getattr(person, 'pk', person) for person in people]
+    result = {}
+    for person, *entry in timeline_queryset(people):
+        result.setdefault(person, []).append(TimelineEntry(*entry))
+    return result
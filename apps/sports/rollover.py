@@ -0,0 +1,77 @@
+'''
+Season rollover for sports memberships.
+
+At the end of a season every open TeamMember, LeagueTeam and LeagueUmpire
+row is closed with one UPDATE per table, and the retained ones are reopened
+for the new season with one ``bulk_create`` per table, all in a single
+transaction.
+'''
+from django.db import connections, transaction
+
+from .models import LeagueTeam, LeagueUmpire, TeamMember
+
+MEMBERSHIP_MODELS = {
+    'team_members': TeamMember,
+    'league_teams': LeagueTeam,
+    'league_umpires': LeagueUmpire,
+}
+
+
+def _renewal(membership, joined):
+    '''A copy of ``membership`` starting on ``joined``.'''
+    model = type(membership)
+    values = {
+        field.attname: getattr(membership, field.attname)
+        for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in ('joined', 'departed')
+    }
+    return model(joined=joined, **values)
+
+
+def _pk_batches(pks, using):
+    '''
+    ``pks`` in lists that fit the backend's query parameter limit, leaving
+    room for the ``joined`` bound next to them.
+    '''
+    pks = list(pks)
+    limit = connections[using].features.max_query_params
+    size = limit - 1 if limit else len(pks) or 1
+    for start in range(0, len(pks), size):
+        yield pks[start:start + size]
+
+
+def rollover(season_end, season_start, retained=None, dry_run=False):
+    '''
+    Close every membership still open on ``season_end`` and reopen the
+    ``retained`` ones on ``season_start``.
+
+    ``retained`` maps the keys of ``MEMBERSHIP_MODELS`` to pks of open
+    memberships. Returns ``{key: {'closed': n, 'reopened': n}}``; with
+    ``dry_run`` the counts are computed without writing anything.
+    '''
+    retained = retained or {}
+    unknown = set(retained) - set(MEMBERSHIP_MODELS)
+    if unknown:
+        raise ValueError(f'Unknown membership kinds: {", ".join(sorted(unknown))}')
+
+    report = {}
+    with transaction.atomic():
+        for key, model in MEMBERSHIP_MODELS.items():
+            open_rows = model.objects.current().filter(joined__lt=season_end)
+            batches = [
+                open_rows.filter(pk__in=batch)
+                for batch in _pk_batches(retained.get(key, ()), open_rows.db)
+            ]
+            if dry_run:
+                report[key] = {
+                    'closed': open_rows.count(),
+                    'reopened': sum(batch.count() for batch in batches),
+                }
+                continue
+            renewals = [
+                _renewal(row, season_start) for batch in batches for row in batch
+            ]
+            closed = open_rows.update(departed=season_end)
+            model.objects.bulk_create(renewals)
+            report[key] = {'closed': closed, 'reopened': len(renewals)}
+    return report
@@ -1,3 +1,225 @@
+import datetime
+import io
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+
+from core.contenttypes import warm_content_types
+
+from .intervals import IntervalTree
+from .rollover import rollover
+from .models import (
+    COACH,
+    PLAYER,
+    UMPIRE,
+    League,
+    LeagueTeam,
+    LeagueUmpire,
+    Person,
+    Team,
+    TeamMember,
+    load_rosters,
+    timelines,
+)
+
+
+class SportsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.league = League.objects.create(name='Northern')
+        cls.teams = [Team.objects.create(name=f'Team {i}') for i in range(3)]
+        for team in cls.teams:
+            LeagueTeam.objects.create(
+                league=cls.league, team=team, joined=datetime.date(2015, 1, 1)
+            )
+        cls.people = {
+            name: Person.objects.create(name=name)
+            for name in ('Ann', 'Bob', 'Cid', 'Dee', 'Eve')
+        }
+        joined = datetime.date(2018, 4, 1)
+        for team, coach, players in (
+            (cls.teams[0], 'Eve', ['Cid', 'Ann']),
+            (cls.teams[1], 'Bob', ['Dee']),
+        ):
+            TeamMember.objects.create(
+                team=team, person=cls.people[coach], role=COACH, joined=joined
+            )
+            for name in players:
+                TeamMember.objects.create(
+                    team=team, person=cls.people[name], role=PLAYER, joined=joined
+                )
+        # a former player must not show up on the roster
+        TeamMember.objects.create(
+            team=cls.teams[0],
+            person=cls.people['Bob'],
+            role=PLAYER,
+            joined=datetime.date(2010, 4, 1),
+            departed=datetime.date(2012, 10, 1),
+        )
+
+
+class RosterTests(SportsTestCase):
+    def names(self, people):
+        return [person.name for person in people]
+
+    def test_current_roster_of_one_team(self):
+        team = self.teams[0]
+        self.assertEqual(self.names(team.current_coaches()), ['Eve'])
+        self.assertEqual(self.names(team.current_players()), ['Ann', 'Cid'])
+
+    def test_prefetched_rosters(self):
+        with self.assertNumQueries(2):
+            teams = list(Team.objects.with_rosters().order_by('pk'))
+            rosters = [
+                (self.names(t.current_coaches()), self.names(t.current_players()))
+                for t in teams
+            ]
+        self.assertEqual(
+            rosters, [(['Eve'], ['Ann', 'Cid']), (['Bob'], ['Dee']), ([], [])]
+        )
+
+    def test_load_rosters(self):
+        with self.assertNumQueries(1):
+            rosters = load_rosters(self.teams)
+        self.assertEqual(self.names(rosters[self.teams[1].pk]['players']), ['Dee'])
+        self.assertEqual(rosters[self.teams[2].pk], {'coaches': [], 'players': []})
+
+        with self.assertNumQueries(1):
+            rosters = self.league.rosters()
+        self.assertEqual(self.names(rosters[self.teams[0].pk]['coaches']), ['Eve'])
+
+
+class MembershipPeriodTests(SportsTestCase):
+    def test_as_of(self):
+        team = self.teams[0]
+        on = TeamMember.objects.filter(team=team).as_of
+        self.assertEqual(on(datetime.date(2011, 1, 1)).get().person.name, 'Bob')
+        self.assertFalse(on(datetime.date(2012, 10, 1)).exists())
+        self.assertEqual(on(datetime.date(2020, 1, 1)).count(), 3)
+        self.assertEqual(
+            LeagueTeam.objects.as_of(datetime.date(2014, 12, 31)).count(), 0
+        )
+
+    def test_overlapping(self):
+        members = TeamMember.objects.filter(team=self.teams[0]).overlapping(
+            datetime.date(2012, 9, 1), datetime.date(2018, 4, 1)
+        )
+        self.assertEqual(members.count(), 4)
+        members = TeamMember.objects.overlapping(
+            datetime.date(2012, 10, 1), datetime.date(2018, 3, 31)
+        )
+        self.assertFalse(members.exists())
+
+    def test_interval_tree_matches_queries(self):
+        tree = IntervalTree.from_memberships(TeamMember.objects.all())
+        self.assertEqual(len(tree), 6)
+        for date in (
+            datetime.date(2010, 4, 1),
+            datetime.date(2012, 10, 1),
+            datetime.date(2018, 4, 1),
+        ):
+            self.assertCountEqual(tree.at(date), TeamMember.objects.as_of(date))
+        window = (datetime.date(2011, 1, 1), datetime.date(2019, 1, 1))
+        self.assertCountEqual(
+            tree.overlapping(*window), TeamMember.objects.overlapping(*window)
+        )
+
+
+class TimelineTests(SportsTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        LeagueUmpire.objects.create(
+            league=cls.league,
+            umpire=cls.people['Bob'],
+            joined=datetime.date(2013, 3, 1),
+            departed=datetime.date(2017, 11, 1),
+        )
+
+    def test_person_timeline(self):
+        bob = self.people['Bob']
+        with self.assertNumQueries(1):
+            timeline = bob.timeline()
+        self.assertEqual(
+            [(entry.role, entry.organisation) for entry in timeline],
+            [(PLAYER, 'Team 0'), (UMPIRE, 'Northern'), (COACH, 'Team 1')],
+        )
+        self.assertEqual(timeline[1].departed, datetime.date(2017, 11, 1))
+        self.assertEqual(bob.timeline(offset=1, limit=1), timeline[1:2])
+
+    def test_bulk_timelines(self):
+        with self.assertNumQueries(1):
+            result = timelines(Person.objects.filter(name__in=['Bob', 'Dee']))
+        self.assertEqual(len(result[self.people['Bob'].pk]), 3)
+        self.assertEqual(
+            [entry.role for entry in result[self.people['Dee'].pk]], [PLAYER]
+        )
+
+
+class RolloverTests(SportsTestCase):
+    end = datetime.date(2021, 10, 1)
+    start = datetime.date(2022, 4, 1)
+
+    def retained(self):
+        keep = TeamMember.objects.current().filter(person__name__in=['Ann', 'Eve'])
+        return {
+            'team_members': list(keep.values_list('pk', flat=True)),
+            'league_teams': list(LeagueTeam.objects.values_list('pk', flat=True)),
+        }
+
+    def test_rollover(self):
+        retained = self.retained()
+        with self.assertNumQueries(9):
+            report = rollover(self.end, self.start, retained)
+        self.assertEqual(
+            report,
+            {
+                'team_members': {'closed': 5, 'reopened': 2},
+                'league_teams': {'closed': 3, 'reopened': 3},
+                'league_umpires': {'closed': 0, 'reopened': 0},
+            },
+        )
+        self.assertEqual([p.name for p in self.teams[0].current_players()], ['Ann'])
+        self.assertEqual(TeamMember.objects.as_of(self.end).count(), 0)
+        self.assertEqual(LeagueTeam.objects.as_of(self.start).count(), 3)
+
+    def test_retained_pks_are_batched(self):
+        retained = self.retained()
+        with patch.object(connection.features, 'max_query_params', 2):
+            report = rollover(self.end, self.start, retained)
+        self.assertEqual(report['team_members']['reopened'], 2)
+        self.assertEqual(report['league_teams']['reopened'], 3)
+        self.assertEqual(LeagueTeam.objects.as_of(self.start).count(), 3)
+
+    def test_dry_run_writes_nothing(self):
+        out = io.StringIO()
+        call_command(
+            'rollover_season', '2021-10-01', '2022-04-01', '--dry-run', stdout=out
+        )
+        self.assertIn('Would close 5 and reopen 0 team members.', out.getvalue())
+        self.assertEqual(TeamMember.objects.current().count(), 5)
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            rollover(self.end, self.start, {'referees': [1]})
+
+
+class TeamMemberListTests(SportsTestCase):
+    def setUp(self):
+        warm_content_types()
 
-# Create your tests here.
+    def test_pages(self):
+        url = reverse('sports:team-member-list', args=[self.teams[0].pk])
+        with patch('apps.sports.views.PAGE_SIZE', 2), self.assertNumQueries(2):
+            data = self.client.get(url).json()
+        self.assertEqual([m['name'] for m in data['results']], ['Eve', 'Cid'])
+        with patch('apps.sports.views.PAGE_SIZE', 2):
+            data = self.client.get(url, {'cursor': data['next']}).json()
+        self.assertEqual([m['name'] for m in data['results']], ['Ann', 'Bob'])
+        self.assertIsNone(data['next'])
+        self.assertIsNotNone(data['previous'])
+        missing = reverse('sports:team-member-list', args=[0])
+        self.assertEqual(self.client.get(missing).status_code, 404)
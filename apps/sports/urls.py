@@ -0,0 +1,13 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'sports'
+
+urlpatterns = [
+    path(
+        'teams/<int:team_pk>/members/',
+        views.team_member_list,
+        name='team-member-list',
+    ),
+]
@@ -1,3 +1,32 @@
-from django.shortcuts import render
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
 
-# Create your views here.
+from core.pagination import InvalidCursor, KeysetPaginator, page_data
+
+from .models import Team
+
+PAGE_SIZE = 50
+
+
+@require_GET
+def team_member_list(request, team_pk):
+    team = get_object_or_404(Team, pk=team_pk)
+    members = team.members.select_related('person')
+    paginator = KeysetPaginator(members, PAGE_SIZE, ordering=['pk'])
+    try:
+        data = page_data(
+            paginator,
+            request.GET.get('cursor'),
+            lambda member: {
+                'id': member.pk,
+                'person': member.person_id,
+                'name': member.person.name,
+                'role': member.role,
+                'joined': member.joined,
+                'departed': member.departed,
+            },
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'invalid cursor'}, status=400)
+    return JsonResponse(data)
@@ -0,0 +1,111 @@
+"""
+Admin changelists that don't slow down as tables grow.
+
+``EstimatedCountMixin`` keeps page numbers but takes the row count from
+``core.pagination.estimate_count()`` rather than running ``COUNT(*)`` on
+each load; the estimate is only displayed, and every page is sliced by
+``list_per_page`` however far off it is. ``KeysetPaginationMixin`` goes
+further for the largest tables: it swaps the changelist for one that walks
+the rows with a ``core.pagination.KeysetPaginator`` cursor, so every page
+costs the same.
+"""
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import InvalidPage
+
+from .pagination import EstimatedCountPaginator, KeysetPaginator
+
+CURSOR_VAR = "cursor"
+
+
+def _set_result_counts(changelist, result_count) -> None:
+    changelist.result_count = result_count
+    changelist.show_full_result_count = changelist.model_admin.show_full_result_count
+    if changelist.show_full_result_count:
+        changelist.full_result_count = changelist.root_queryset.count()
+    else:
+        changelist.full_result_count = None
+    changelist.show_admin_actions = not changelist.show_full_result_count or bool(
+        changelist.full_result_count
+    )
+
+
+class EstimatedCountChangeList(ChangeList):
+    def get_results(self, request):
+        # ChangeList decides between pages and the whole queryset from the
+        # count, which an estimate can't be trusted with
+        paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page
+        )
+        try:
+            page = paginator.page(self.page_num)
+        except InvalidPage:
+            raise IncorrectLookupParameters
+
+        _set_result_counts(self, paginator.count)
+        self.result_list = page.object_list
+        self.can_show_all = False
+        self.show_all = False
+        self.multi_page = page.has_other_pages()
+        self.paginator = paginator
+
+
+class KeysetChangeList(ChangeList):
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # a cursor only makes sense for the filters and ordering it came from
+        if CURSOR_VAR not in (new_params or {}):
+            remove = [*(remove or []), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        paginator = self.model_admin.get_keyset_paginator(
+            request, self.queryset, self.list_per_page
+        )
+        try:
+            page = paginator.page(request.GET.get(CURSOR_VAR))
+        except InvalidPage:
+            raise IncorrectLookupParameters
+
+        _set_result_counts(self, paginator.count)
+        self.result_count_estimated = paginator.estimate
+        self.result_list = page.object_list
+        self.can_show_all = False
+        self.show_all = False
+        self.multi_page = page.has_other_pages()
+        self.paginator = paginator
+        self.page = page
+        self.next_url = (
+            self.get_query_string({CURSOR_VAR: page.next_cursor})
+            if page.has_next()
+            else None
+        )
+        self.previous_url = (
+            self.get_query_string({CURSOR_VAR: page.previous_cursor})
+            if page.has_previous()
+            else None
+        )
+
+
+class EstimatedCountMixin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return EstimatedCountChangeList
+
+
+class KeysetPaginationMixin:
+    change_list_template = "admin/keyset_change_list.html"
+    show_full_result_count = False
+    estimate_count = True
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_keyset_paginator(self, request, queryset, per_page):
+        return KeysetPaginator(queryset, per_page, estimate=self.estimate_count)
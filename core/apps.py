@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.core.signals import request_started
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+
+    def ready(self):
+        from .contenttypes import warm_on_request
+
+        request_started.connect(warm_on_request, dispatch_uid="warm_content_types")
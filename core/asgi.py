@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# Start every worker with a warm content type cache.
+from core.contenttypes import warm_at_startup  # noqa: E402
+
+warm_at_startup()
@@ -0,0 +1,88 @@
+"""
+Keep ``ContentType.objects`` warm in every worker process.
+
+Every generic foreign key lookup goes through the content type manager, whose
+cache lives in the process and starts empty. The full map of content types is
+published to the Django cache under a key that changes with the database and
+the set of installed models, so a fresh worker fills its manager cache with
+one cache read instead of querying ``django_content_type``. The map expires
+after ``CACHE_TIMEOUT``, so ids from a database that was flushed or restored
+in place don't outlive a day.
+
+``warm_at_startup()`` runs when the WSGI or ASGI application is created. A
+database that isn't reachable yet must not keep the worker from booting, so
+the warm is then left to ``warm_on_request`` and the first request.
+"""
+import hashlib
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+CACHE_KEY_PREFIX = "contenttypes"
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def content_types_version() -> str:
+    """
+    ``CONTENT_TYPES_CACHE_VERSION`` when set, otherwise a digest of the
+    installed models, which changes whenever a deploy adds or removes one.
+    """
+    version = getattr(settings, "CONTENT_TYPES_CACHE_VERSION", None)
+    if version:
+        return str(version)
+    labels = sorted(
+        model._meta.label_lower for model in apps.get_models(include_auto_created=True)
+    )
+    return hashlib.sha1(",".join(labels).encode()).hexdigest()[:12]
+
+
+def database_identity(using=DEFAULT_DB_ALIAS) -> str:
+    """A digest of where ``using`` points, so aliases of other databases differ."""
+    settings_dict = connections[using].settings_dict
+    identity = [str(settings_dict.get(name)) for name in ("HOST", "PORT", "NAME")]
+    return hashlib.sha1(":".join(identity).encode()).hexdigest()[:12]
+
+
+def warm_content_types(using=DEFAULT_DB_ALIAS) -> int:
+    """
+    Fill the content type manager cache for the installed apps, reading the
+    shared map from the cache and publishing it on a miss. Returns the number
+    of content types loaded.
+    """
+    fields = ["id", "app_label", "model"]
+    key = ":".join(
+        [CACHE_KEY_PREFIX, database_identity(using), content_types_version()]
+    )
+    rows = cache.get(key)
+    if rows is None:
+        app_labels = [config.label for config in apps.get_app_configs()]
+        rows = list(
+            ContentType.objects.using(using)
+            .filter(app_label__in=app_labels)
+            .values_list(*fields)
+        )
+        cache.set(key, rows, CACHE_TIMEOUT)
+
+    for row in rows:
+        ContentType.objects._add_to_cache(
+            using, ContentType.from_db(using, fields, row)
+        )
+    return len(rows)
+
+
+def warm_on_request(sender, **kwargs) -> None:
+    # ``ContentType.objects.clear_cache()`` empties the manager cache, e.g.
+    # after migrate; refill it before the request needs it.
+    if not ContentType.objects._cache.get(DEFAULT_DB_ALIAS):
+        warm_content_types()
+
+
+def warm_at_startup() -> None:
+    try:
+        warm_content_types()
+    except DatabaseError:
+        # warm_on_request() fills the cache once the database is up
+        ContentType.objects.clear_cache()
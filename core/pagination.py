@@ -0,0 +1,307 @@
+"""
+Keyset (cursor) pagination.
+
+Offset pagination makes the database skip every row before the page, so
+deep pages get slower and slower, and numbering pages needs a ``COUNT(*)``.
+A keyset paginator instead remembers the ordering key of the last row it
+served and asks for the rows after it, which an index on that key answers
+in the same time for any page. The key is handed out as an opaque cursor.
+
+The ordering must end in a unique key; the primary key is appended when it
+doesn't. On every backend, NULLs sort as if larger than any value: last in
+ascending order, first in descending order.
+"""
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, InvalidPage, PageNotAnInteger, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Max, Q
+from django.db.models.expressions import OrderBy
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def estimate_count(queryset) -> int:
+    """
+    A cheap row count for ``queryset``: the planner's estimate on
+    PostgreSQL, the highest primary key for a whole table elsewhere, and an
+    exact ``COUNT(*)`` when there is nothing better. Estimates can be too
+    low, so only show them; never bound a page by one.
+    """
+    query = queryset.query
+    unfiltered = not query.where and not query.distinct
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            if unfiltered:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+                # -1, or 0 before PostgreSQL 14, for a table never analyzed
+                if row and row[0] > 0:
+                    return int(row[0])
+            else:
+                sql, params = query.sql_with_params()
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return int(plan[0]["Plan"]["Plan Rows"])
+    elif unfiltered:
+        # found through the primary key index without reading the table
+        return queryset.aggregate(count=Max("pk"))["count"] or 0
+    return queryset.count()
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A page-number ``Paginator`` counting with ``estimate_count()``.
+
+    Pages are sliced by ``per_page`` alone, with one extra row to tell
+    whether another page follows, so a low estimate never hides rows. Each
+    page corrects ``count`` by what it found: up to the rows seen so far,
+    and exactly on the last page.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        return estimate_count(self.object_list)
+
+    def validate_number(self, number) -> int:
+        # unlike Paginator, pages past the estimate are allowed
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("That page number is not an integer")
+        if number < 1:
+            raise EmptyPage("That page number is less than 1")
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        objects = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not objects and number > 1:
+            raise EmptyPage("That page contains no results")
+        seen = bottom + len(objects)
+        if len(objects) <= self.per_page or self.count < seen:
+            self.__dict__["count"] = seen
+            self.__dict__.pop("num_pages", None)
+        return self._get_page(objects[:self.per_page], number, self)
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, previous_cursor, paginator):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.paginator = paginator
+
+    def __repr__(self):
+        return f"<KeysetPage of {len(self.object_list)} objects>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Pages of ``per_page`` objects from ``queryset`` in ``ordering`` (by
+    default the queryset's own), navigated with ``page(cursor)``.
+
+    ``count`` is exact unless ``estimate`` is set, in which case it comes
+    from ``estimate_count()``. Pages themselves never count.
+    """
+
+    def __init__(self, queryset, per_page, ordering=None, estimate=False):
+        self.per_page = int(per_page)
+        self.estimate = estimate
+        if ordering is None:
+            ordering = queryset.query.order_by or queryset.model._meta.ordering
+        self.ordering = self._keys(queryset.model, ordering)
+        self.nullable = {
+            path: self._nullable(queryset.model, path) for path, _ in self.ordering
+        }
+        self.queryset = queryset.order_by(
+            *(self._order_by(path, descending) for path, descending in self.ordering)
+        )
+
+    @staticmethod
+    def _keys(model, ordering) -> list:
+        keys = []
+        for field in ordering:
+            if isinstance(field, OrderBy) and isinstance(field.expression, F):
+                keys.append((field.expression.name, field.descending))
+            elif isinstance(field, str) and field != "?":
+                keys.append((field.lstrip("-"), field.startswith("-")))
+            else:
+                raise TypeError(f"Can't paginate by {field!r} with a keyset.")
+        unique = {"pk", model._meta.pk.name}
+        unique |= {f.name for f in model._meta.concrete_fields if f.unique}
+        if not any(path in unique for path, _ in keys):
+            keys.append(("pk", keys[-1][1] if keys else False))
+        return keys
+
+    @staticmethod
+    def _nullable(model, path) -> bool:
+        """Whether ``path`` can be NULL, through a nullable relation too."""
+        for name in path.split("__"):
+            field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+            if field.null:
+                return True
+            if field.is_relation:
+                model = field.related_model
+        return False
+
+    def _order_by(self, path, descending):
+        if not self.nullable[path]:
+            return f"-{path}" if descending else path
+        if descending:
+            return F(path).desc(nulls_first=True)
+        return F(path).asc(nulls_last=True)
+
+    @cached_property
+    def count(self) -> int:
+        if self.estimate:
+            return estimate_count(self.queryset)
+        return self.queryset.count()
+
+    def _field(self, path):
+        model = self.queryset.model
+        field = None
+        for name in path.split("__"):
+            field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+            if field.is_relation:
+                model = field.related_model
+                field = field.target_field
+        return field
+
+    def _value(self, obj, path):
+        *names, last = path.split("__")
+        for name in names:
+            obj = getattr(obj, name)
+        if last == "pk":
+            return obj.pk
+        field = obj._meta.get_field(last)
+        return getattr(obj, field.attname)
+
+    def encode_cursor(self, obj, backwards=False) -> str:
+        data = {
+            "o": [path for path, _ in self.ordering],
+            "k": [self._value(obj, path) for path, _ in self.ordering],
+        }
+        if backwards:
+            data["b"] = 1
+        data = json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor) -> tuple:
+        """``(values, backwards)`` of ``cursor``."""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if data["o"] != [path for path, _ in self.ordering]:
+                raise ValueError("the ordering changed")
+            if len(data["k"]) != len(self.ordering):
+                raise ValueError("wrong number of keys")
+            values = [
+                self._field(path).to_python(value)
+                for (path, _), value in zip(self.ordering, data["k"])
+            ]
+        except (ValueError, TypeError, KeyError, ValidationError) as e:
+            raise InvalidCursor(f"Invalid cursor: {e}") from e
+        return values, bool(data.get("b"))
+
+    def _beyond(self, path, value, greater):
+        """
+        Rows strictly past ``value`` on ``path``, with NULL as the largest
+        value, or ``None`` when nothing can be.
+        """
+        if value is None:
+            return None if greater else Q(**{f"{path}__isnull": False})
+        condition = Q(**{f"{path}__{'gt' if greater else 'lt'}": value})
+        if greater and self.nullable[path]:
+            condition |= Q(**{f"{path}__isnull": True})
+        return condition
+
+    def _after(self, values, backwards) -> Q:
+        # (a, b, c) after (x, y, z) is a > x, or a = x and b > y, or ...
+        # the last key is never NULL, so there is always some condition
+        conditions = []
+        equal = Q()
+        for (path, descending), value in zip(self.ordering, values):
+            beyond = self._beyond(path, value, greater=descending == backwards)
+            if beyond is not None:
+                conditions.append(equal & beyond)
+            if value is None:
+                equal &= Q(**{f"{path}__isnull": True})
+            else:
+                equal &= Q(**{path: value})
+        condition = reduce(or_, conditions)
+        first_path, descending = self.ordering[0]
+        if self.nullable[first_path]:
+            return condition
+        # lets the database start a range scan on the leading key
+        lookup = "gte" if descending == backwards else "lte"
+        return Q(**{f"{first_path}__{lookup}": values[0]}) & condition
+
+    def page(self, cursor=None) -> KeysetPage:
+        backwards = False
+        queryset = self.queryset
+        if cursor:
+            values, backwards = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._after(values, backwards))
+        if backwards:
+            queryset = queryset.reverse()
+        objects = list(queryset[:self.per_page + 1])
+        more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if backwards:
+            objects.reverse()
+        if not objects:
+            return KeysetPage([], None, None, self)
+        has_next = more if not backwards else True
+        has_previous = more if backwards else bool(cursor)
+        return KeysetPage(
+            objects,
+            self.encode_cursor(objects[-1]) if has_next else None,
+            self.encode_cursor(objects[0], backwards=True) if has_previous else None,
+            self,
+        )
+
+
+def page_data(paginator, cursor, serialize) -> dict:
+    """
+    The page at ``cursor`` as ``{"results": [...], "next": ..., "previous":
+    ...}`` for a JSON listing; raises ``InvalidCursor`` for a bad cursor.
+    """
+    page = paginator.page(cursor)
+    return {
+        "results": [serialize(obj) for obj in page],
+        "next": page.next_cursor,
+        "previous": page.previous_cursor,
+    }
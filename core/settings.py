@@ -26,10 +26,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'core',
     'apps.course',
     'apps.member',
     'apps.pizza',
-    # 'apps.sports',
+    'apps.sports',
     'apps.shop',
 ]
 
@@ -48,7 +49,7 @@ ROOT_URLCONF = 'core.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -66,6 +67,17 @@ WSGI_APPLICATION = 'core.wsgi.application'
 DATABASES = {"default": dj_database_url.config(default=config("SQLITE_URL"))}
 
 
+# Cache shared by the worker processes
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default=""),
+    }
+}
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
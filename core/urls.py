@@ -14,8 +14,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('shop/', include('apps.shop.urls')),
+    path('course/', include('apps.course.urls')),
+    path('member/', include('apps.member.urls')),
+    path('sports/', include('apps.sports.urls')),
 ]